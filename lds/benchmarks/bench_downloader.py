@@ -0,0 +1,196 @@
+"""
+Downloads synthetic games from a local stub of the match API, sequentially and with the concurrent downloader, and
+crawls the matchlists of a synthetic roster the same way. Then syncs the roster again once some of its accounts have
+played new games, requesting the same window of every matchlist and with per account watermarks.
+
+The stub answers after a fixed latency, enforces app and method rate limits over sliding windows and returns 429s
+with Retry-After when a client goes over them, so the limiter is exercised the same way the real API would do it.
+
+Run from the lds directory: python -m benchmarks.bench_downloader [-g 200] [-a 100] [-l 0.1] [-w 8] [-sw 300]
+"""
+import argparse
+import collections
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from connectors.downloader import Downloader
+
+APP_LIMITS = [(50, 1), (1000, 60)]
+METHOD_LIMITS = [(30, 1)]
+GAMES_PER_ACCOUNT = 250
+
+
+class StubRiotApi(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), StubRiotApiHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = collections.defaultdict(collections.deque)
+        self.n_requests = 0
+        self.n_429 = 0
+        self.n_matches = 0
+        self.new_games = collections.defaultdict(list)
+
+    def get_matchlist(self, account_id):
+        # Teammates share games, consecutive accounts overlap in half of their history. Newest games first.
+        game_ids = [account_id * GAMES_PER_ACCOUNT // 2 + i for i in range(GAMES_PER_ACCOUNT)]
+        game_ids += self.new_games[account_id]
+        return [{'gameId': gid, 'platformId': 'EUW1', 'timestamp': gid * 60000} for gid in sorted(game_ids)[::-1]]
+
+    def play(self, account_ids, n_games):
+        for account_id in account_ids:
+            self.new_games[account_id] += [10 ** 6 + account_id * 100 + len(self.new_games[account_id]) + i
+                                           for i in range(n_games)]
+
+    def register(self, method):
+        # Returns the limit type exceeded (if any) and the current counts of every limit
+        with self.lock:
+            self.n_requests += 1
+            now = time.monotonic()
+            counts = {}
+            exceeded = None
+            for key, limits in [('application', APP_LIMITS), (method, METHOD_LIMITS)]:
+                calls = self.calls[key]
+                longest = max(seconds for _, seconds in limits)
+                while calls and calls[0] <= now - longest:
+                    calls.popleft()
+                counts[key] = [(sum(1 for c in calls if c > now - seconds), seconds) for _, seconds in limits]
+                if exceeded is None and any(used >= count for (count, _), (used, _) in zip(limits, counts[key])):
+                    exceeded = key
+            if exceeded is not None:
+                self.n_429 += 1
+                return exceeded, counts
+            for key in counts:
+                self.calls[key].append(now)
+                counts[key] = [(used + 1, seconds) for used, seconds in counts[key]]
+            return None, counts
+
+
+class StubRiotApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if '/matchlists/' in self.path:
+            method = 'matchlist'
+        elif '/timelines/' in self.path:
+            method = 'timeline'
+        else:
+            method = 'match'
+        exceeded, counts = self.server.register(method)
+        time.sleep(self.server.latency)
+        if exceeded is not None:
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('X-Rate-Limit-Type', 'application' if exceeded == 'application' else 'method')
+            body = b'{}'
+        elif method == 'matchlist':
+            path, query = self.path.split('?')
+            account_id = int(path.split('/')[-1])
+            params = dict(p.split('=') for p in query.split('&'))
+            matches = [m for m in self.server.get_matchlist(account_id)
+                       if m['timestamp'] >= int(params.get('beginTime', 0))]
+            matches = matches[int(params['beginIndex']):int(params['endIndex'])]
+            self.server.n_matches += len(matches)
+            self.send_response(200 if matches else 404)
+            body = json.dumps({'matches': matches}).encode()
+        else:
+            self.send_response(200)
+            game_id = int(self.path.rstrip('/').split('/')[-1])
+            body = json.dumps({'gameId': game_id, 'platformId': 'EUW1'}).encode()
+        self.send_header('X-App-Rate-Limit', ','.join('{}:{}'.format(c, s) for c, s in APP_LIMITS))
+        self.send_header('X-App-Rate-Limit-Count', ','.join('{}:{}'.format(c, s) for c, s in counts['application']))
+        self.send_header('X-Method-Rate-Limit', ','.join('{}:{}'.format(c, s) for c, s in METHOD_LIMITS))
+        self.send_header('X-Method-Rate-Limit-Count', ','.join('{}:{}'.format(c, s) for c, s in counts[method]))
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(n_games, latency, workers):
+    server = StubRiotApi(latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    downloader = Downloader('stub-key', api_url='http://127.0.0.1:{}'.format(server.server_address[1]),
+                            workers=workers)
+    saved = []
+    start = time.perf_counter()
+    downloader.download(list(range(n_games)), lambda g: downloader.get_match_and_timeline(g, 'EUW1'), saved.append,
+                        desc='{} workers'.format(workers))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    assert sorted(d['match']['gameId'] for d in saved) == list(range(n_games))
+    return elapsed, server.n_requests, server.n_429
+
+
+def run_crawl(n_accounts, latency, workers):
+    server = StubRiotApi(latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    downloader = Downloader('stub-key', api_url='http://127.0.0.1:{}'.format(server.server_address[1]),
+                            workers=workers)
+    start = time.perf_counter()
+    first = None
+    game_ids = []
+    for m in downloader.crawl_matchlists(range(n_accounts), 'EUW1', end_index=1000, queue=[420]):
+        if first is None:
+            first = time.perf_counter() - start
+        game_ids.append(m['gameId'])
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    expected = set(a * GAMES_PER_ACCOUNT // 2 + i for a in range(n_accounts) for i in range(GAMES_PER_ACCOUNT))
+    assert len(game_ids) == len(expected) and set(game_ids) == expected
+    return elapsed, first, len(game_ids), server.n_requests, server.n_429
+
+
+def run_sync(n_accounts, latency, workers, window):
+    # 10% of the accounts play 3 games after the first sync
+    server = StubRiotApi(latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    downloader = Downloader('stub-key', api_url='http://127.0.0.1:{}'.format(server.server_address[1]),
+                            workers=workers)
+    watermarks = {}
+    list(downloader.crawl_matchlists(range(n_accounts), 'EUW1', end_index=window, watermarks=watermarks))
+    active = range(0, n_accounts, 10)
+    server.play(active, 3)
+    results = []
+    for description, sync_watermarks in [('same window', None), ('watermarks', watermarks)]:
+        server.n_requests = server.n_matches = 0
+        start = time.perf_counter()
+        matches = downloader.crawl_matchlists(range(n_accounts), 'EUW1', end_index=window, watermarks=sync_watermarks)
+        game_ids = [m['gameId'] for m in matches]
+        results.append((description, time.perf_counter() - start, server.n_requests, server.n_matches))
+    server.shutdown()
+    assert set(game_ids) == set(gid for acc in active for gid in server.new_games[acc])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Downloader benchmark against a rate limited stub API.')
+    parser.add_argument('-g', '--games', type=int, default=200, help='Number of games to download.')
+    parser.add_argument('-a', '--accounts', type=int, default=100, help='Number of accounts to crawl.')
+    parser.add_argument('-l', '--latency', type=float, default=0.1, help='Latency of every request in seconds.')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='Workers of the concurrent downloader.')
+    parser.add_argument('-sw', '--sync_window', type=int, default=300, help='Games per matchlist of the syncs.')
+    args = parser.parse_args()
+
+    for workers in [1, args.workers]:
+        elapsed, n_requests, n_429 = run(args.games, args.latency, workers)
+        print('Download, {} workers: {:.2f}s, {:.1f} games/s, {} requests, {} 429s.'
+              .format(workers, elapsed, args.games / elapsed, n_requests, n_429))
+    for workers in [1, args.workers]:
+        elapsed, first, n_games, n_requests, n_429 = run_crawl(args.accounts, args.latency, workers)
+        print('Matchlists, {} workers: {:.2f}s, first id after {:.2f}s, {} games, {} requests, {} 429s.'
+              .format(workers, elapsed, first, n_games, n_requests, n_429))
+    results = run_sync(args.accounts, args.latency, args.workers, args.sync_window)
+    for description, elapsed, n_requests, n_matches in results:
+        print('Sync, {}: {:.2f}s, {} requests, {} matches returned.'
+              .format(description, elapsed, n_requests, n_matches))
+
+
+if __name__ == '__main__':
+    main()
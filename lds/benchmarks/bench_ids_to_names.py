@@ -0,0 +1,111 @@
+"""
+Compares the old merge based id to name resolution with ids_to_names on a synthetic dataset.
+
+Run from the lds directory: python -m benchmarks.bench_ids_to_names [-g 10000] [-s 500]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from converters.data2frames import ids_to_names
+from converters.static_data import StaticData
+from config.constants import ITEMS_COLS, SUMMS_COLS, RUNES_COLS, BANS_COLS
+
+N_CHAMPS = 150
+N_ITEMS = 250
+N_SUMMS = 15
+N_FILLER_COLS = 120
+
+
+class StaticDataCollection:
+    def __init__(self):
+        champs = {'Champ{}'.format(i): {'key': str(i), 'name': 'Champ {}'.format(i)} for i in range(1, N_CHAMPS + 1)}
+        items = {str(1000 + i): {'name': 'Item {}'.format(i)} for i in range(N_ITEMS)}
+        summs = {'Summ{}'.format(i): {'key': str(i), 'name': 'Spell {}'.format(i)} for i in range(1, N_SUMMS + 1)}
+        runes = [{'id': 8000 + p * 100, 'name': 'Path {}'.format(p),
+                  'slots': [{'runes': [{'id': 8000 + p * 100 + s * 10 + r + 1, 'name': 'Rune {}{}{}'.format(p, s, r)}
+                                       for r in range(3)]} for s in range(4)]} for p in range(5)]
+        self.docs = {'champion': {'data': champs}, 'item': {'data': items}, 'summoner': {'data': summs},
+                     'runes': {'runes': runes}}
+
+    def find_one(self, query, projection=None):
+        return self.docs[query['type']]
+
+
+def build_dataset(n_games):
+    rng = np.random.RandomState(0)
+    n_rows = n_games * 10
+    data = {'gameId': np.repeat(np.arange(n_games), 10), 'participantId': np.tile(np.arange(1, 11), n_games),
+            'championId': rng.randint(1, N_CHAMPS + 1, n_rows)}
+    for col in ITEMS_COLS:
+        data[col] = rng.randint(1000, 1000 + N_ITEMS, n_rows)
+    for col in SUMMS_COLS:
+        data[col] = rng.randint(1, N_SUMMS + 1, n_rows)
+    for col in RUNES_COLS:
+        data[col] = 8000 + rng.randint(0, 5, n_rows) * 100 + rng.randint(0, 4, n_rows) * 10 + rng.randint(1, 4, n_rows)
+    for col in BANS_COLS:
+        data[col] = rng.randint(1, N_CHAMPS + 1, n_rows)
+    for i in range(N_FILLER_COLS):
+        data['stat{}'.format(i)] = rng.randint(0, 10000, n_rows)
+    df = pd.DataFrame(data)
+    # Exported games are object columns, as they come from the transposed per game frames.
+    return df.astype(object)
+
+
+def merge_ids_to_names(df, static_data):
+    champs, items, summs, runes = static_data.champs, static_data.items, static_data.summs, static_data.runes
+    df1 = df.merge(
+        champs.rename(columns={'name': 'champ_name'}), left_on='championId', right_on='key').drop('key', axis=1)
+    for name in ITEMS_COLS:
+        df1 = df1.merge(items.rename(columns={'name': '{}_name'.format(name)}), left_on=name,
+                        right_on='id', how='left').drop('id', axis=1)
+    for name in SUMMS_COLS:
+        df1 = df1.merge(summs.rename(columns={'name': '{}_name'.format(name)}), left_on=name,
+                        right_on='key', how='left').drop('key', axis=1)
+    for name in RUNES_COLS:
+        df1 = df1.merge(runes.rename(columns={'name': '{}_name'.format(name)}), left_on=name,
+                        right_on='id', how='left').drop('id', axis=1)
+    for name in BANS_COLS:
+        df1 = df1.merge(champs.rename(columns={'name': '{}_name'.format(name)}), left_on=name,
+                        right_on='key', how='left').drop('key', axis=1)
+    return df1
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ids_to_names benchmark.')
+    parser.add_argument('-g', '--games', type=int, default=10000, help='Number of games of the dataset.')
+    parser.add_argument('-s', '--sample', type=int, default=500, help='Games used to time the per game merges.')
+    args = parser.parse_args()
+
+    static_data = StaticData(StaticDataCollection())
+    # Load the tables before timing, both approaches share them.
+    _ = static_data.champ_names, static_data.item_names, static_data.summ_names, static_data.rune_names
+    df = build_dataset(args.games)
+    print('Dataset: {} games, {} rows, {} columns.'.format(args.games, df.shape[0], df.shape[1]))
+
+    games = [df.iloc[i * 10:(i + 1) * 10] for i in range(min(args.sample, args.games))]
+    t_sample, _ = timeit(lambda: [merge_ids_to_names(g, static_data) for g in games])
+    t_per_game = t_sample / len(games) * args.games
+    t_merge, merged = timeit(merge_ids_to_names, df, static_data)
+    t_map, mapped = timeit(ids_to_names, df, static_data)
+
+    name_cols = [c for c in merged.columns if c.endswith('_name')]
+    # Inner merges can regroup rows by champion, compare them in the same order.
+    merged = merged.sort_values(['gameId', 'participantId'])
+    assert list(mapped.columns) == list(merged.columns)
+    assert (mapped[name_cols].fillna('').values == merged[name_cols].fillna('').values).all()
+
+    print('Merges per game (extrapolated from {} games): {:.2f}s'.format(len(games), t_per_game))
+    print('Merges over the whole dataset: {:.2f}s'.format(t_merge))
+    print('ids_to_names: {:.2f}s ({:.0f}x vs per game, {:.1f}x vs whole dataset merges)'
+          .format(t_map, t_per_game / t_map, t_merge / t_map))
+
+
+if __name__ == '__main__':
+    main()
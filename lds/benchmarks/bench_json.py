@@ -0,0 +1,100 @@
+"""
+Compares the stdlib json path raw data used to go through with the codec of converters.json_codec (orjson or ujson
+when installed) on synthetic timelines of the size of real ones: JSON files read and written, API responses decoded
+and packfile records decompressed.
+
+Run from the lds directory: python -m benchmarks.bench_json [-t 50] [-f 35] [-e 70]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import zlib
+import numpy as np
+from converters.data2files import read_json, write_json, compress_json, decompress_json
+from converters.json_codec import JSON_LIBRARY, loads
+
+EVENT_TYPES = ['WARD_PLACED', 'WARD_KILL', 'ITEM_PURCHASED', 'ITEM_DESTROYED', 'SKILL_LEVEL_UP', 'CHAMPION_KILL',
+               'ELITE_MONSTER_KILL', 'BUILDING_KILL']
+
+
+def make_timeline(rng, n_frames, n_events):
+    # Same structure as the match/v4 timelines, about 350 KB of JSON with the default sizes
+    frames = []
+    for f in range(n_frames):
+        participant_frames = {}
+        for p in range(1, 11):
+            participant_frames[str(p)] = {
+                'participantId': p, 'position': {'x': int(rng.randint(0, 15000)), 'y': int(rng.randint(0, 15000))},
+                'currentGold': int(rng.randint(0, 3000)), 'totalGold': int(rng.randint(0, 20000)),
+                'level': int(rng.randint(1, 19)), 'xp': int(rng.randint(0, 20000)),
+                'minionsKilled': int(rng.randint(0, 300)), 'jungleMinionsKilled': int(rng.randint(0, 100)),
+                'dominionScore': 0, 'teamScore': 0}
+        events = []
+        for _ in range(n_events):
+            event = {'type': EVENT_TYPES[rng.randint(0, len(EVENT_TYPES))],
+                     'timestamp': int(f * 60000 + rng.randint(0, 60000)), 'participantId': int(rng.randint(1, 11))}
+            if event['type'] == 'CHAMPION_KILL':
+                event.update({'killerId': int(rng.randint(0, 11)), 'victimId': int(rng.randint(1, 11)),
+                              'assistingParticipantIds': [int(p) for p in rng.randint(1, 11, rng.randint(0, 5))],
+                              'position': {'x': int(rng.randint(0, 15000)), 'y': int(rng.randint(0, 15000))}})
+            elif event['type'].startswith('WARD'):
+                event.update({'wardType': 'YELLOW_TRINKET', 'creatorId': int(rng.randint(0, 11))})
+            elif event['type'].startswith('ITEM'):
+                event['itemId'] = int(rng.randint(1001, 4000))
+            else:
+                event.update({'skillSlot': int(rng.randint(1, 5)), 'levelUpType': 'NORMAL'})
+            events.append(event)
+        frames.append({'participantFrames': participant_frames, 'events': events, 'timestamp': f * 60000})
+    return {'frames': frames, 'frameInterval': 60000}
+
+
+def timed(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON codec benchmark.')
+    parser.add_argument('-t', '--timelines', type=int, default=50, help='Number of timelines.')
+    parser.add_argument('-f', '--frames', type=int, default=35, help='Frames per timeline.')
+    parser.add_argument('-e', '--events', type=int, default=70, help='Events per frame.')
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    timelines = [make_timeline(rng, args.frames, args.events) for _ in range(args.timelines)]
+    save_dir = tempfile.mkdtemp()
+    names = ['tl_{}.json'.format(i) for i in range(len(timelines))]
+    payloads = [json.dumps(tl).encode() for tl in timelines]
+    records = [compress_json(tl) for tl in timelines]
+    print('{} timelines of {:.0f} KB on average, codec: {}.'
+          .format(len(timelines), sum(map(len, payloads)) / len(payloads) / 1024, JSON_LIBRARY))
+
+    def stdlib_write(i):
+        with open(os.path.join(save_dir, names[i]), 'w') as fp:
+            json.dump(timelines[i], fp)
+
+    def stdlib_read(i):
+        with open(os.path.join(save_dir, names[i]), 'r') as fp:
+            return json.load(fp)
+
+    indexes = range(len(timelines))
+    results = [
+        ('write files', timed(stdlib_write, indexes),
+         timed(lambda i: write_json(timelines[i], save_dir, names[i]), indexes)),
+        ('read files', timed(stdlib_read, indexes), timed(lambda i: read_json(save_dir, names[i]), indexes)),
+        ('decode responses', timed(lambda p: json.loads(p.decode()), payloads), timed(loads, payloads)),
+        ('read packfile records', timed(lambda r: json.loads(zlib.decompress(r).decode()), records),
+         timed(decompress_json, records)),
+    ]
+    assert read_json(save_dir, names[0]) == timelines[0] and decompress_json(records[0]) == timelines[0]
+    for description, stdlib_time, codec_time in results:
+        print('{:>22}: json {:.3f}s, {} {:.3f}s ({:.1f}x).'
+              .format(description, stdlib_time, JSON_LIBRARY, codec_time, stdlib_time / codec_time))
+
+
+if __name__ == '__main__':
+    main()
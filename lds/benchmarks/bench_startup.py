@@ -0,0 +1,65 @@
+"""
+Measures the startup of the CLI with python -X importtime: the modules imported by slds.py itself, which is all that
+--help and the checks of the arguments load, and by each connector. Exits with an error when a module imports one of
+the heavy dependencies it should leave to the code that needs them, or when slds.py is slower than --max_ms.
+
+Run from the lds directory: python -m benchmarks.bench_startup [-n 5] [--max_ms 100]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+LDS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['pandas', 'numpy', 'pymongo', 'bson', 'riotwatcher', 'requests', 'tqdm', 'dropbox', 'xlsxwriter',
+                 'pyarrow']
+# Dependencies every module may not import when it is loaded
+NOT_IMPORTED = {
+    'slds': HEAVY_MODULES,
+    'connectors.filesystem': ['dropbox', 'xlsxwriter'],
+    'connectors.database': ['dropbox', 'xlsxwriter'],
+    # Loaded by every worker of the transform pool
+    'converters.parallel': ['pymongo', 'bson', 'riotwatcher', 'requests', 'dropbox', 'xlsxwriter'],
+}
+
+
+def import_times(module):
+    # Cumulative microseconds of every top level package imported by the module, the module itself included
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module], cwd=LDS_DIR,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            package = name.strip().split('.')[0]
+            times[package] = max(times.get(package, 0), int(cumulative))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI startup benchmark.')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='Runs per module, the fastest one is kept.')
+    parser.add_argument('--max_ms', type=float, default=None, help='Fail if importing slds takes longer.')
+    args = parser.parse_args()
+
+    errors = []
+    for module, not_imported in NOT_IMPORTED.items():
+        runs = [import_times(module) for _ in range(args.runs)]
+        times = min(runs, key=lambda t: t[module.split('.')[0]])
+        total_ms = times[module.split('.')[0]] / 1e3
+        heavy = ', '.join('{} {:.0f} ms'.format(name, times[name] / 1e3) for name in HEAVY_MODULES if name in times)
+        print('{:>22}: {:.0f} ms. {}'.format(module, total_ms, heavy or 'No heavy dependencies.'))
+        unexpected = [name for name in not_imported if name in times]
+        if unexpected:
+            errors.append('{} imports {}.'.format(module, ', '.join(unexpected)))
+        if module == 'slds' and args.max_ms is not None and total_ms > args.max_ms:
+            errors.append('slds takes {:.0f} ms to import, more than {:.0f} ms.'.format(total_ms, args.max_ms))
+
+    if errors:
+        sys.exit('\n'.join(errors))
+
+
+if __name__ == '__main__':
+    main()
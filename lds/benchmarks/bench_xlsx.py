@@ -0,0 +1,76 @@
+"""
+Writes a synthetic export to XLSX with DataFrame.to_excel and with the constant memory XlsxExporter, the latter from
+the whole frame and in chunks like streamed exports do.
+
+Every writer runs in its own process, the memory reported is how much its peak RSS grew while writing.
+
+Run from the lds directory: python -m benchmarks.bench_xlsx [-r 100000] [-c 100] [-cs 20000]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from connectors.exporters import XlsxExporter
+
+
+def make_dataset(n_rows, n_cols):
+    # Same mix of columns as the exports: mostly ints, some floats with nulls, names and a few flags
+    rng = np.random.RandomState(0)
+    names = np.array(['Name {}'.format(i) for i in range(500)], dtype=object)
+    columns = {}
+    for i in range(n_cols):
+        kind = i % 10
+        if kind < 6:
+            columns['int_{}'.format(i)] = rng.randint(0, 30000, n_rows)
+        elif kind < 8:
+            values = rng.rand(n_rows) * 1000
+            values[rng.rand(n_rows) < 0.1] = np.nan
+            columns['float_{}'.format(i)] = values
+        elif kind == 8:
+            columns['name_{}'.format(i)] = names[rng.randint(0, len(names), n_rows)]
+        else:
+            columns['flag_{}'.format(i)] = rng.rand(n_rows) < 0.5
+    return pd.DataFrame(columns)
+
+
+def write(method, n_rows, n_cols, chunk_size):
+    df = make_dataset(n_rows, n_cols)
+    path = os.path.join(tempfile.mkdtemp(), 'bench.xlsx')
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if method == 'to_excel':
+        df.to_excel(path, index=False)
+    else:
+        exporter = XlsxExporter(path)
+        size = chunk_size if method == 'chunks' else len(df)
+        for i in range(0, len(df), size):
+            exporter.write(df.iloc[i:i + size])
+        exporter.close()
+    elapsed = time.perf_counter() - start
+    grown = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+    size_mb = os.path.getsize(path) / 1e6
+    os.remove(path)
+    return elapsed, grown, size_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description='XLSX writers benchmark.')
+    parser.add_argument('-r', '--rows', type=int, default=100000, help='Rows of the dataset.')
+    parser.add_argument('-c', '--cols', type=int, default=100, help='Columns of the dataset.')
+    parser.add_argument('-cs', '--chunk_size', type=int, default=20000, help='Rows per chunk of the chunked run.')
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    for method in ['to_excel', 'exporter', 'chunks']:
+        with ctx.Pool(1) as pool:
+            elapsed, grown, size_mb = pool.apply(write, (method, args.rows, args.cols, args.chunk_size))
+        print('{:>8}: {:.2f}s, {:.0f} rows/s, peak RSS +{:.0f} MB, {:.1f} MB file.'
+              .format(method, elapsed, args.rows / elapsed, grown, size_mb))
+
+
+if __name__ == '__main__':
+    main()
@@ -11,11 +11,12 @@ class Player:
         self.team = team
         self.substitute = substitute
         self.account_type = account_type
-        self.rw = RiotWatcher(API_KEY)
 
-    def get_player(self):
+    def get_player(self, summoner=None):
+        # Players registered in bulk get the summoner already looked up
         region = REGIONS[self.region.upper()]
-        summoner = self.rw.summoner.by_name(summoner_name=self.summoner_name, region=region)
+        if summoner is None:
+            summoner = RiotWatcher(API_KEY).summoner.by_name(summoner_name=self.summoner_name, region=region)
         result = {
             'name': self.player_name,
             'summoner_name': self.summoner_name,
@@ -1,4 +1,3 @@
-from numpy import int64
 import re
 
 API_KEY = ""
@@ -15,19 +14,35 @@ LCK_GAMES_DIR = MATCHES_RAW_DATA_DIR + 'lck_games/'
 SOLOQ_GAMES_DIR = MATCHES_RAW_DATA_DIR + 'soloq/'
 SCRIMS_GAMES_DIR = MATCHES_RAW_DATA_DIR + 'scrims/'
 EXPORTS_DIR = WORK_DIR + 'exports/'
+DATASETS_DIR = EXPORTS_DIR + 'datasets/'
 STATIC_DATA_DIR = WORK_DIR + 'static_data/'
+RAW_DATA_CATALOG = 'catalog.sqlite'
+SUMMONER_CACHE_PATH = LEAGUES_DATA_DIR + 'summoners.sqlite'
+# Packfiles of a raw data directory: compressed games appended to segments of up to PACK_SEGMENT_SIZE bytes
+RAW_DATA_PACKS_DIR = 'packs'
+PACK_INDEX = 'index.sqlite'
+PACK_SEGMENT_SIZE = 256 * 1024 * 1024
+PACK_COMPRESSION_LEVEL = 6
 SLO_MATCHES_FILE_PATH = LEAGUES_DATA_DIR + 'slo_spring_S8.csv'
 LCK_MATCHES_FILE_PATH = LEAGUES_DATA_DIR + 'lck_spring_S8.csv'
 SCRIMS_MATCHES_FILE_PATH = LEAGUES_DATA_DIR + 'scrims.csv'
 SOLOQ_MATCHES_FILE_PATH = LEAGUES_DATA_DIR + 'soloq.csv'
 SLO_DATASET_CSV = EXPORTS_DIR + 'slo_dataset.csv'
 SLO_DATASET_XLSX = EXPORTS_DIR + 'slo_dataset.xlsx'
+SLO_DATASET_PARQUET = EXPORTS_DIR + 'slo_dataset_parquet/'
 LCK_DATASET_CSV = EXPORTS_DIR + 'lck_dataset.csv'
 LCK_DATASET_XLSX = EXPORTS_DIR + 'lck_dataset.xlsx'
+LCK_DATASET_PARQUET = EXPORTS_DIR + 'lck_dataset_parquet/'
 SCRIMS_DATASET_CSV = EXPORTS_DIR + 'scrims_dataset.csv'
 SCRIMS_DATASET_XLSX = EXPORTS_DIR + 'scrims_dataset.xlsx'
+SCRIMS_DATASET_PARQUET = EXPORTS_DIR + 'scrims_dataset_parquet/'
 SOLOQ_DATASET_CSV = EXPORTS_DIR + 'soloq_dataset.csv'
 SOLOQ_DATASET_XLSX = EXPORTS_DIR + 'soloq_dataset.xlsx'
+SOLOQ_DATASET_PARQUET = EXPORTS_DIR + 'soloq_dataset_parquet/'
+
+HTTP_POOL_SIZE = 16
+# (connect, read) timeouts in seconds
+HTTP_TIMEOUT = (5, 30)
 
 DATA_DRAGON_URL = 'http://ddragon.leagueoflegends.com/cdn/{version}/data/{language}/{endpoint}'
 DD_LANGUAGE = 'en_US'
@@ -42,6 +57,31 @@ RUNES_COLS = ["perk0", "perk1", "perk2", "perk3", "perk4", "perk5", "perkPrimary
 ITEMS_COLS = ["item0", "item1", "item2", "item3", "item4", "item5", "item6"]
 SUMMS_COLS = ['spell1Id', 'spell2Id']
 BANS_COLS = ['ban1_team', 'ban2_team', 'ban3_team', 'ban4_team', 'ban5_team']
+TIMELINE_DELTAS = [('creepsPerMinDeltas', 'cspm'), ('csDiffPerMinDeltas', 'csdiffpm'),
+                   ('damageTakenPerMinDeltas', 'dmgtpm'), ('damageTakenDiffPerMinDeltas', 'dmgtdiffpm'),
+                   ('xpPerMinDeltas', 'xppm'), ('xpDiffPerMinDeltas', 'xpdiffpm'), ('goldPerMinDeltas', 'gpm')]
+TIMELINE_DELTAS_BUCKETS = [('0-10', '0_10'), ('10-20', '10_20'), ('20-30', '20_30'), ('30-end', '30_end')]
+TIMELINE_DELTAS_COLS = [(key, [(bucket, prefix + suffix) for bucket, suffix in TIMELINE_DELTAS_BUCKETS])
+                        for key, prefix in TIMELINE_DELTAS]
+TIMELINE_DERIVED_METRICS = {'combinedMinionsKilled': ['minionsKilled', 'jungleMinionsKilled']}
+TIMELINE_THRESHOLDS = [('tt4kgold', 'totalGold', 4000), ('tt7kgold', 'totalGold', 7000),
+                       ('tt50cs', 'minionsKilled', 50), ('tt100cs', 'minionsKilled', 100),
+                       ('tt50jcs', 'jungleMinionsKilled', 50), ('tt100jcs', 'jungleMinionsKilled', 100),
+                       ('tt50ccs', 'combinedMinionsKilled', 50), ('tt100ccs', 'combinedMinionsKilled', 100),
+                       ('ttlvl6', 'level', 6), ('ttlvl11', 'level', 11)]
+TIMELINE_SNAPSHOTS = [('gold_at_5', 'totalGold', 5), ('gold_at_10', 'totalGold', 10),
+                      ('gold_at_15', 'totalGold', 15), ('gold_at_20', 'totalGold', 20),
+                      ('ccs_at_5', 'combinedMinionsKilled', 5), ('ccs_at_10', 'combinedMinionsKilled', 10),
+                      ('ccs_at_15', 'combinedMinionsKilled', 15), ('ccs_at_20', 'combinedMinionsKilled', 20)]
+WARD_TYPES = [('YELLOW_TRINKET', 'yellow_trinkets'), ('CONTROL_WARD', 'control_wards'), ('UNDEFINED', 'undefined'),
+              ('SIGHT_WARD', 'sight_wards'), ('BLUE_TRINKET', 'blue_trinkets')]
+# (column, event type, participant field, subtype field, subtype value)
+TIMELINE_EVENT_COUNTERS = [(c + '_placed', 'WARD_PLACED', 'creatorId', 'wardType', ward) for ward, c in WARD_TYPES] + \
+                          [(c + '_killed', 'WARD_KILL', 'killerId', 'wardType', ward) for ward, c in WARD_TYPES] + \
+                          [('champion_kill_events', 'CHAMPION_KILL', 'killerId', None, None),
+                           ('elite_monster_kill_events', 'ELITE_MONSTER_KILL', 'killerId', None, None),
+                           ('building_kill_events', 'BUILDING_KILL', 'killerId', None, None),
+                           ('item_purchase_events', 'ITEM_PURCHASED', 'participantId', None, None)]
 
 LCK = 'LCK'
 SLO = 'SLO'
@@ -52,6 +92,7 @@ IDS_FILE_PATH = 'ids_file_path'
 DTYPES = 'dtypes'
 EXCEL_EXPORT_PATH = 'excel_export_path'
 CSV_EXPORT_PATH = 'csv_export_path'
+PARQUET_EXPORT_PATH = 'parquet_export_path'
 OFFICIAL_LEAGUE = 'official_league'
 CSV_EXPORT_PATH_MERGED = 'csv_export_path_merged'
 EXCEL_EXPORT_PATH_MERGED = 'excel_export_path_merged'
@@ -62,28 +103,31 @@ LEAGUES_DATA_DICT = {
         OFFICIAL_LEAGUE: True,
         DTYPES: {},
         CSV_EXPORT_PATH: LCK_DATASET_CSV,
-        EXCEL_EXPORT_PATH: LCK_DATASET_XLSX},
+        EXCEL_EXPORT_PATH: LCK_DATASET_XLSX,
+        PARQUET_EXPORT_PATH: LCK_DATASET_PARQUET},
     SLO: {
         IDS_FILE_PATH: SLO_MATCHES_FILE_PATH,
         RAW_DATA_PATH: SLO_GAMES_DIR,
         OFFICIAL_LEAGUE: False,
         DTYPES: {'datetime': str, 'series_id': str, 'week': int, 'event': str, 'game': int,
-                 'game_id': int64, 'blue': str, 'red': str, 'blue_win': int, 'p_1': str,
+                 'game_id': 'int64', 'blue': str, 'red': str, 'blue_win': int, 'p_1': str,
                  'p_2': str, 'p_3': str, 'p_4': str, 'p_5': str, 'p_6': str, 'p_7': str,
                  'p_8': str, 'p_9': str, 'p_10': str},
         CSV_EXPORT_PATH: EXPORTS_DIR + SLO_DATASET_CSV,
-        EXCEL_EXPORT_PATH: EXPORTS_DIR + SLO_DATASET_XLSX},
+        EXCEL_EXPORT_PATH: EXPORTS_DIR + SLO_DATASET_XLSX,
+        PARQUET_EXPORT_PATH: SLO_DATASET_PARQUET},
     SCRIMS: {
         IDS_FILE_PATH: SCRIMS_MATCHES_FILE_PATH,
         RAW_DATA_PATH: SCRIMS_GAMES_DIR,
         OFFICIAL_LEAGUE: False,
-        DTYPES: {'date': str, 'enemy': str, 'game_id': int64, 'match_history': str,
+        DTYPES: {'date': str, 'enemy': str, 'game_id': 'int64', 'match_history': str,
                  'blue': str, 'red': str, 'pos_1': str, 'pos_2': str, 'pos_3': str, 'pos_4': str,
                  'pos_5': str,'pos_6': str, 'pos_7': str, 'pos_8': str, 'pos_9': str, 'pos_10': str,
                  'p_1': str, 'p_2': str, 'p_3': str, 'p_4': str, 'p_5': str, 'p_6': str,'p_7': str,
                  'p_8': str, 'p_9': str, 'p_10': str},
         CSV_EXPORT_PATH: SCRIMS_DATASET_CSV,
-        EXCEL_EXPORT_PATH: SCRIMS_DATASET_XLSX},
+        EXCEL_EXPORT_PATH: SCRIMS_DATASET_XLSX,
+        PARQUET_EXPORT_PATH: SCRIMS_DATASET_PARQUET},
     SOLOQ: {
         IDS_FILE_PATH: SOLOQ_MATCHES_FILE_PATH,
         RAW_DATA_PATH: SOLOQ_GAMES_DIR,
@@ -91,6 +135,7 @@ LEAGUES_DATA_DICT = {
         DTYPES: {},
         CSV_EXPORT_PATH: SOLOQ_DATASET_CSV,
         EXCEL_EXPORT_PATH: SOLOQ_DATASET_XLSX,
+        PARQUET_EXPORT_PATH: SOLOQ_DATASET_PARQUET,
         CSV_EXPORT_PATH_MERGED: EXPORTS_DIR + 'soloq_dataset_merged.csv',
         EXCEL_EXPORT_PATH_MERGED: EXPORTS_DIR + 'soloq_dataset_merged.xlsx'
     }
@@ -105,6 +150,37 @@ CONNECTORS_DATA_DICT = {
 SUPPORTED_LEAGUES = list(LEAGUES_DATA_DICT.keys())
 SUPPORTED_CONNECTORS = list(CONNECTORS_DATA_DICT.keys())
 
+# Raw data documents kept in memory before inserting them, and the longest time they wait there (seconds)
+BULK_WRITE_BATCH_SIZE = 100
+BULK_WRITE_FLUSH_INTERVAL = 5
+# Games read from Mongo per query when exporting
+EXPORT_BATCH_SIZE = 500
+# Games transformed and written at a time by streaming exports
+EXPORT_CHUNK_SIZE = 2000
+# Games transformed by every task of the process pool of parallel exports
+TRANSFORM_CHUNK_SIZE = 50
+# Rows of an Excel worksheet, header included
+XLSX_MAX_ROWS = 1048576
+
+# (keys, options) of the indexes created by --ensure_indexes, raw data collections are named after every league
+RAW_MATCH_INDEXES = [([('platformId', 1), ('gameId', 1)], {'unique': True}),
+                     ([('patch', 1), ('gameCreation', 1)], {}),
+                     ([('gameCreation', 1)], {}),
+                     ([('participantIdentities.player.currentAccountId', 1)], {})]
+# gameId first, it is the field timelines are joined on
+RAW_TL_INDEXES = [([('gameId', 1), ('platformId', 1)], {'unique': True})]
+LEAGUE_INFO_INDEXES = [([('game_id', 1), ('realm', 1)], {}),
+                       ([('split', 1), ('season', 1)], {}),
+                       ([('timestamp', 1)], {})]
+PLAYERS_INDEXES = [([('account_id', 1)], {}), ([('team_abbv', 1)], {}), ([('region', 1)], {})]
+TEAMS_INDEXES = [([('key', 1)], {}), ([('competition', 1)], {})]
+WATERMARKS_INDEXES = [([('account_id', 1), ('platform_id', 1)], {'unique': True})]
+
+# Rows of the DB output are upserted by this key, only when the hash of their values changes
+EXPORT_KEY_FIELDS = ['gameId', 'platformId', 'participantId']
+EXPORT_HASH_FIELD = '_row_hash'
+EXPORT_STAGING_SUFFIX = '_staging'
+
 EXPORTS_DB_NAME = 'exports'
 LEAGUES_DB_NAME = 'leagues_info'
 MONGODB_CONN = 'mongodb+srv://{user}:{password}@{url}'.format(**MONGODB_CREDENTIALS)
@@ -126,6 +202,22 @@ REGIONS = {
 
 DEFAULT_REGION = REGIONS['EUW']
 
+RIOT_API_URL = 'https://{platform}.api.riotgames.com'
+MATCH_ENDPOINT = '/lol/match/v4/matches/{id}'
+MATCH_TL_ENDPOINT = '/lol/match/v4/timelines/by-match/{id}'
+MATCHLIST_ENDPOINT = '/lol/match/v4/matchlists/by-account/{account_id}'
+SUMMONER_ENDPOINT = '/lol/summoner/v4/summoners/by-name/{name}'
+# Seconds a summoner looked up by name is used from the cache before it is looked up again
+SUMMONER_CACHE_TTL = 7 * 24 * 60 * 60
+# Widest index range the matchlist endpoint accepts in one request
+MATCHLIST_PAGE_SIZE = 100
+# Used until the first response tells the real limits of the key, (requests, seconds)
+DEFAULT_APP_RATE_LIMITS = [(20, 1), (100, 120)]
+# Seconds added to every rate limit window to absorb the latency between our clock and the API one
+RATE_LIMIT_MARGIN = 0.1
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_MAX_RETRIES = 3
+
 TOURNAMENT_GAME_ENDPOINT = 'https://acs.leagueoflegends.com/v1/stats/game/{tr}/{id}?gameHash={hash}'
 TOURNAMENT_TL_ENDPOINT = 'https://acs.leagueoflegends.com/v1/stats/game/{tr}/{id}/timeline?gameHash={hash}'
 
@@ -139,5 +231,7 @@ RIFT_GAMES_QUEUES = [NORMAL_DRAFT_QUEUE_ID, SOLOQ_QUEUE_ID, NORMAL_BLIND_QUEUE_I
 
 DB_ITEMS = ['players', 'teams', 'competitions']
 DB_CHANGE_TYPE = ['add', 'edit', 'remove']
+# Columns of the roster files of the players registration
+ROSTER_COLS = ['player_name', 'summoner_name', 'region', 'main_role', 'team', 'substitute', 'account_type']
 
-AVAILABLE_OUTPUTS = ['XLSX', 'CSV', 'DB']
+AVAILABLE_OUTPUTS = ['XLSX', 'CSV', 'PARQUET', 'DB']
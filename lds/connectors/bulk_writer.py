@@ -0,0 +1,86 @@
+import threading
+from pymongo.errors import BulkWriteError
+from config.constants import BULK_WRITE_BATCH_SIZE, BULK_WRITE_FLUSH_INTERVAL
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class BulkWriter:
+    # Buffers the documents of several collections of a database and inserts them with one unordered insert_many
+    # per collection once batch_size documents are waiting or flush_interval seconds have passed since the first one
+    def __init__(self, database, batch_size=BULK_WRITE_BATCH_SIZE, flush_interval=BULK_WRITE_FLUSH_INTERVAL):
+        self.database = database
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        self.buffers = {}
+        self.collections = {}
+        self.n_buffered = 0
+        self.n_inserted = 0
+        self.n_duplicated = 0
+        self.timer = None
+        # Errors of the flushes run by the timer thread, raised by the next insert, flush or close
+        self.timer_error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def insert(self, collection_name, document):
+        with self.lock:
+            self.__raise_timer_error()
+            if collection_name not in self.collections:
+                self.collections[collection_name] = self.database.get_collection(collection_name)
+                self.buffers[collection_name] = []
+            self.buffers[collection_name].append(document)
+            self.n_buffered += 1
+            if self.n_buffered >= self.batch_size:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.__timer_flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self.__raise_timer_error()
+            self.__flush()
+
+    def __timer_flush(self):
+        with self.lock:
+            try:
+                self.__flush()
+            except Exception as e:
+                self.timer_error = e
+
+    def __raise_timer_error(self):
+        if self.timer_error is not None:
+            error, self.timer_error = self.timer_error, None
+            raise error
+
+    def __flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        for collection_name, documents in self.buffers.items():
+            if documents:
+                self.buffers[collection_name] = []
+                self.n_buffered -= len(documents)
+                self.__insert_many(self.collections[collection_name], documents)
+
+    def __insert_many(self, collection, documents):
+        try:
+            self.n_inserted += len(collection.insert_many(documents, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            # Documents already stored are skipped, any other error is raised once the rest have been written
+            errors = e.details['writeErrors']
+            duplicated = [err for err in errors if err['code'] == DUPLICATE_KEY_ERROR]
+            self.n_inserted += e.details['nInserted']
+            self.n_duplicated += len(duplicated)
+            if len(duplicated) < len(errors):
+                raise
+
+    def close(self):
+        self.flush()
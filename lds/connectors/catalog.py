@@ -0,0 +1,151 @@
+import os
+import sqlite3
+from converters.data2files import read_json
+from connectors.packfile import PackStore
+from converters.data2frames import version_to_patch
+from config.constants import RAW_DATA_CATALOG
+
+
+class RawDataCatalog:
+    def __init__(self, save_dir):
+        self.save_dir = save_dir
+        path = os.path.join(save_dir, RAW_DATA_CATALOG)
+        new_catalog = not os.path.exists(path)
+        self.cnx = sqlite3.connect(path)
+        self.cnx.executescript('''
+            CREATE TABLE IF NOT EXISTS games (
+                game_id INTEGER NOT NULL,
+                platform_id TEXT NOT NULL,
+                file_id TEXT NOT NULL,
+                match_file TEXT,
+                tl_file TEXT,
+                game_creation INTEGER,
+                game_version TEXT,
+                patch TEXT,
+                queue INTEGER,
+                PRIMARY KEY (game_id, platform_id)
+            );
+            CREATE TABLE IF NOT EXISTS game_accounts (
+                game_id INTEGER NOT NULL,
+                platform_id TEXT NOT NULL,
+                account_id TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS account_watermarks (
+                account_id TEXT NOT NULL,
+                platform_id TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                PRIMARY KEY (account_id, platform_id)
+            );
+            CREATE INDEX IF NOT EXISTS games_game_creation ON games (game_creation);
+            CREATE INDEX IF NOT EXISTS games_patch ON games (patch);
+            CREATE INDEX IF NOT EXISTS game_accounts_account_id ON game_accounts (account_id);
+            CREATE INDEX IF NOT EXISTS game_accounts_game ON game_accounts (game_id, platform_id);
+        ''')
+        if new_catalog:
+            self.rebuild()
+
+    def add_game(self, match, file_id, match_file, tl_file, commit=True):
+        game_id, platform_id = match['gameId'], str(match['platformId'])
+        game_version = match.get('gameVersion')
+        patch = version_to_patch(game_version) if game_version else None
+        account_ids = set()
+        for p in match.get('participantIdentities', []):
+            try:
+                account_ids.add(str(p['player']['currentAccountId']))
+            except KeyError:
+                pass
+        self.cnx.execute('INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (game_id, platform_id, file_id, match_file, tl_file, match.get('gameCreation'), game_version,
+                          patch, match.get('queueId')))
+        self.cnx.execute('DELETE FROM game_accounts WHERE game_id = ? AND platform_id = ?', (game_id, platform_id))
+        self.cnx.executemany('INSERT INTO game_accounts VALUES (?, ?, ?)',
+                             [(game_id, platform_id, acc) for acc in account_ids])
+        if commit:
+            self.cnx.commit()
+
+    def rebuild(self):
+        files = {}
+        for file_name in os.listdir(self.save_dir):
+            stem = file_name[:-len('.json')]
+            if not file_name.endswith('.json') or '_' not in stem:
+                continue
+            file_id = stem.split('_')[1]
+            files.setdefault(file_id, {})['tl' if stem.endswith('_tl') else 'match'] = file_name
+
+        self.cnx.execute('DELETE FROM games')
+        self.cnx.execute('DELETE FROM game_accounts')
+        for file_id, file_names in files.items():
+            if 'match' in file_names and 'tl' in file_names:
+                match = read_json(save_dir=self.save_dir, file_name=file_names['match'])
+                self.add_game(match, file_id, file_names['match'], file_names['tl'], commit=False)
+        # Packed games have no files
+        if PackStore.exists(self.save_dir):
+            packs = PackStore(self.save_dir)
+            for match in packs.iter_matches():
+                self.add_game(match, str(match['gameId']), None, None, commit=False)
+            packs.close()
+        self.cnx.commit()
+
+    def get_unpacked_games(self):
+        return self.cnx.execute('SELECT game_id, platform_id, match_file, tl_file FROM games '
+                                'WHERE match_file IS NOT NULL AND tl_file IS NOT NULL').fetchall()
+
+    def mark_packed(self, game_id, platform_id, commit=True):
+        self.cnx.execute('UPDATE games SET match_file = NULL, tl_file = NULL WHERE game_id = ? AND platform_id = ?',
+                         (game_id, platform_id))
+        if commit:
+            self.cnx.commit()
+
+    def commit(self):
+        self.cnx.commit()
+
+    def get_file_names(self, game_id):
+        row = self.cnx.execute('SELECT match_file, tl_file FROM games WHERE game_id = ?', (int(game_id),)).fetchone()
+        if row is None:
+            raise KeyError('Game {} not found in the catalog of {}.'.format(game_id, self.save_dir))
+        return {'match_filename': row[0], 'tl_filename': row[1]}
+
+    def get_game_ids(self, patch=None, begin_time=None, end_time=None, account_ids=None, queues=None):
+        query = 'SELECT DISTINCT g.game_id FROM games g'
+        conditions = []
+        params = []
+        if account_ids is not None:
+            if not account_ids:
+                return []
+            account_ids = [str(acc) for acc in account_ids]
+            query += ' JOIN game_accounts a ON a.game_id = g.game_id AND a.platform_id = g.platform_id'
+            conditions.append('a.account_id IN ({})'.format(', '.join('?' * len(account_ids))))
+            params += account_ids
+        if patch is not None:
+            conditions.append('g.patch = ?')
+            params.append(version_to_patch(patch))
+            if patch.count('.') > 1:
+                conditions.append('g.game_version LIKE ?')
+                params.append(patch + '%')
+        if begin_time is not None:
+            conditions.append('g.game_creation >= ?')
+            params.append(begin_time)
+        if end_time is not None:
+            conditions.append('g.game_creation <= ?')
+            params.append(end_time)
+        if queues is not None:
+            conditions.append('g.queue IN ({})'.format(', '.join('?' * len(queues))))
+            params += list(queues)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        return [row[0] for row in self.cnx.execute(query, params)]
+
+    def get_watermarks(self, platform_id, account_ids):
+        # Timestamp of the newest game seen in the matchlist of every account synced before
+        rows = dict(self.cnx.execute('SELECT account_id, timestamp FROM account_watermarks WHERE platform_id = ?',
+                                     (str(platform_id),)).fetchall())
+        return {acc: rows[str(acc)] for acc in account_ids if str(acc) in rows}
+
+    def set_watermarks(self, platform_id, watermarks):
+        self.cnx.executemany('INSERT INTO account_watermarks VALUES (?, ?, ?) ON CONFLICT (account_id, platform_id) '
+                             'DO UPDATE SET timestamp = MAX(timestamp, excluded.timestamp)',
+                             [(str(acc), str(platform_id), timestamp) for acc, timestamp in watermarks.items()])
+        self.cnx.commit()
+
+    def close(self):
+        self.cnx.close()
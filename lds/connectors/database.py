@@ -1,26 +1,37 @@
 import os
-import urllib.request
-import json
 import pandas as pd
-from pymongo import MongoClient
-from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import MongoClient, UpdateOne, InsertOne, ReplaceOne, DeleteOne
+from pymongo.errors import OperationFailure
 from riotwatcher import RiotWatcher
 from tqdm import tqdm
-from requests.exceptions import HTTPError
-from connectors import dropbox_upload
-from converters.data2files import get_runes_reforged_json
-from converters.data2frames import game_to_dataframe as g2df, get_db_generic_dataframe
-from converters.data2frames import get_soloq_dataframe
+from connectors.downloader import Downloader, hold_watermarks
+from connectors.bulk_writer import BulkWriter, DUPLICATE_KEY_ERROR
+from connectors.exporters import CsvExporter, XlsxExporter, ParquetExporter, DbExporter
+from connectors.summoner_cache import SummonerCache, normalize_summoner_name
+from connectors.http_client import get_runes_reforged_json
+from classes.entities import Player
+from converters.data2frames import games_to_dataframe, ids_to_names, get_db_generic_dataframe, version_to_patch
+from converters.data2frames import get_soloq_dataframe, records_to_dataframe
+from converters.data2pipelines import soloq_participants_pipeline
+from converters.parallel import GameTransformer
+from converters.static_data import get_static_data, invalidate_static_data
 from datetime import datetime as dt, timedelta
 from config.constants import MONGODB_CONN, SOLOQ, REGIONS, CUSTOM_PARTICIPANT_COLS, \
-    STANDARD_POSITIONS, SCRIMS_POSITIONS_COLS, TOURNAMENT_GAME_ENDPOINT, EXPORTS_DIR, \
-    RIFT_GAMES_QUEUES, TOURNAMENT_TL_ENDPOINT, LEAGUES_DATA_DICT, EXCEL_EXPORT_PATH, \
-    DB_ITEMS, DB_CHANGE_TYPE, CSV_EXPORT_PATH
+    STANDARD_POSITIONS, SCRIMS_POSITIONS_COLS, EXPORTS_DIR, \
+    RIFT_GAMES_QUEUES, LEAGUES_DATA_DICT, EXCEL_EXPORT_PATH, \
+    DB_ITEMS, DB_CHANGE_TYPE, CSV_EXPORT_PATH, EXPORT_BATCH_SIZE, SUPPORTED_LEAGUES, RAW_MATCH_INDEXES, \
+    RAW_TL_INDEXES, LEAGUE_INFO_INDEXES, PLAYERS_INDEXES, TEAMS_INDEXES, BULK_WRITE_BATCH_SIZE, EXPORTS_DB_NAME, \
+    PARQUET_EXPORT_PATH, ROSTER_COLS, WATERMARKS_INDEXES
 
 
 class DataBase:
     def __init__(self, api_key, region, league):
         self.rw = RiotWatcher(api_key)
+        self.downloader = Downloader(api_key)
         self.region = region
         self.league = league
         self.mongo_cnx = MongoClient(MONGODB_CONN)
@@ -35,10 +46,68 @@ class DataBase:
         self.mongo_teams = self.mongo_cnx.slds.teams
         self.mongo_competitions = self.mongo_cnx.slds.competitions
         self.mongo_slo = self.mongo_cnx.slds.slo
+        self.mongo_watermarks = self.mongo_cnx.slds.matchlist_watermarks
+        self.raw_data_writer = BulkWriter(self.mongo_cnx.slds)
+        self.explain = False
+        self.workers = 1
+        self.transformer = None
+        self.watermarks = None
+        self.game_timestamps = {}
+
+    def ensure_indexes(self):
+        slds = self.mongo_cnx.slds
+        collections = [(slds.players, PLAYERS_INDEXES), (slds.teams, TEAMS_INDEXES),
+                       (self.mongo_watermarks, WATERMARKS_INDEXES)]
+        for league in SUPPORTED_LEAGUES:
+            self.__backfill_patch(slds.get_collection(league.lower() + '_m'))
+            collections.append((slds.get_collection(league.lower() + '_m'), RAW_MATCH_INDEXES))
+            collections.append((slds.get_collection(league.lower() + '_tl'), RAW_TL_INDEXES))
+            if league != SOLOQ:
+                collections.append((slds.get_collection(league.lower()), LEAGUE_INFO_INDEXES))
+
+        for coll, indexes in collections:
+            for keys, options in indexes:
+                try:
+                    name = coll.create_index(keys, **options)
+                except OperationFailure as e:
+                    if e.code != DUPLICATE_KEY_ERROR:
+                        raise
+                    print('\t{}: duplicated games found, {} index created as non unique.'.format(coll.name, keys))
+                    name = coll.create_index(keys)
+                print('\t{}: {}'.format(coll.name, name))
+
+    @staticmethod
+    def __backfill_patch(coll):
+        # Games stored before the patch field was added at ingest
+        versions = coll.distinct('gameVersion', {'patch': {'$exists': False}})
+        for version in versions:
+            coll.update_many({'gameVersion': version, 'patch': {'$exists': False}},
+                             {'$set': {'patch': version_to_patch(version)}})
+        if versions:
+            print('\t{}: patch added to the games of {} game versions.'.format(coll.name, len(versions)))
+
+    def __explain(self, cursor, description):
+        plan = cursor.explain()['queryPlanner']['winningPlan']
+        print('\t[explain] {}: {}'.format(description, self.__describe_plan(plan.get('queryPlan', plan))))
+
+    @staticmethod
+    def __describe_plan(plan):
+        # FETCH <- IXSCAN(patch_1_gameCreation_1), COLLSCAN means that no index is used
+        stage = plan['stage']
+        if 'indexName' in plan:
+            stage += '({})'.format(plan['indexName'])
+        children = [plan['inputStage']] if 'inputStage' in plan else plan.get('inputStages', [])
+        if len(children) == 1:
+            stage += ' <- ' + DataBase.__describe_plan(children[0])
+        elif children:
+            stage += ' <- [' + ', '.join(DataBase.__describe_plan(child) for child in children) + ']'
+        return stage
 
     def get_old_and_new_game_ids(self, **kwargs):
         if self.league == 'SOLOQ':
             cursor = self.mongo_soloq_m_col.find({}, {'_id': 0, 'gameId': 1, 'platformId': 1})
+            if self.explain:
+                self.__explain(cursor.clone(), 'Downloaded games')
             current_game_ids = [(gid['gameId'], gid['platformId']) for gid in cursor]
             acc_ids = self.get_account_ids(**kwargs)
             print('\t{} account ids found.'.format(len(acc_ids)))
@@ -107,60 +176,65 @@ class DataBase:
     def get_new_ids(self, old, new):
         if self.league != SOLOQ:
             return [gid for gid in new if (gid[0], gid[1]) not in old]
-        return list(set(new) - set(old))
+        old = set(old)
+        return (gid for gid in new if gid not in old)
 
     def download_games(self, current_game_ids, new_game_ids):
-        def tournament_match_to_dict(id1, hash1, tournament):
-            with urllib.request.urlopen(TOURNAMENT_GAME_ENDPOINT.format(tr=tournament, id=id1, hash=hash1)) as url:
-                match = json.loads(url.read().decode())
-            with urllib.request.urlopen(TOURNAMENT_TL_ENDPOINT.format(tr=tournament, id=id1, hash=hash1)) as url:
-                tl = json.loads(url.read().decode())
-            return match, tl
+        def fetch(item):
+            if item[1] not in REGIONS.values():
+                return self.downloader.get_tournament_match_and_timeline(item[0], item[1], item[2])
+            return self.downloader.get_match_and_timeline(item[0], item[1])
 
         ids_not_in_db = self.get_new_ids(current_game_ids, new_game_ids)
-        print('\t{} new games to be downloaded.'.format(len(ids_not_in_db)))
-        if ids_not_in_db:
-            for item in tqdm(ids_not_in_db, desc='\tDownloading games'):
-                try:
-                    if item[1] not in REGIONS.values():
-                        match, timeline = tournament_match_to_dict(item[0], item[2], item[1])
-                    else:
-                        match = self.rw.match.by_id(match_id=item[0], region=item[1])
-                        timeline = self.rw.match.timeline_by_match(match_id=item[0], region=item[1])
-                    data = {'match': match, 'timeline': timeline}
-                    self.__save_match_raw_data(data=data)
-                except HTTPError:
-                    pass
+        n_games, failed = self.downloader.download(ids_not_in_db, fetch, self.__save_match_raw_data,
+                                                   desc='\tDownloading games')
+        self.raw_data_writer.flush()
+        if failed:
+            print('\t{} games could not be downloaded.'.format(len(failed)))
+            hold_watermarks(self.watermarks, [self.game_timestamps[g] for g in failed if g in self.game_timestamps])
+        if n_games:
+            print('\t{} new games downloaded.'.format(n_games - len(failed)))
         else:
             print('\tAll games already downloaded.')
         return None
 
     def get_game_ids(self, acc_ids, **kwargs):
-        matchlist_kwargs = {k: kwargs[k] for k in ['begin_index', 'n_games']}
-        matchlist_kwargs['queue'] = RIFT_GAMES_QUEUES
-        matchlist_kwargs['region'] = self.region
-        if matchlist_kwargs['n_games'] is not None and matchlist_kwargs['begin_index'] is not None:
-            matchlist_kwargs['end_index'] = matchlist_kwargs['begin_index'] + matchlist_kwargs.pop('n_games')
-        elif matchlist_kwargs['n_games'] is not None and matchlist_kwargs['begin_index'] is None:
-            matchlist_kwargs['end_index'] = matchlist_kwargs.pop('n_games')
-        elif matchlist_kwargs['n_games'] is None:
-            matchlist_kwargs['end_index'] = matchlist_kwargs.pop('n_games')
-
-        matches = list(chain.from_iterable(
-            [self.rw.match.matchlist_by_account(account_id=acc, **matchlist_kwargs)['matches'] for acc in acc_ids]))
-        result = list(set([(m['gameId'], m['platformId']) for m in matches]))
-        return result
+        # Without a begin index only the games newer than the watermark of every account are requested, the
+        # watermarks are saved once the games are downloaded
+        if kwargs['begin_index'] is None:
+            self.watermarks = self.get_watermarks(acc_ids)
+            print('\t{} accounts synced before, only their new games are requested.'.format(len(self.watermarks)))
+        begin_index = kwargs['begin_index'] if kwargs['begin_index'] is not None else 0
+        end_index = begin_index + kwargs['n_games'] if kwargs['n_games'] is not None else None
+        matches = self.downloader.crawl_matchlists(acc_ids, self.region, begin_index=begin_index, end_index=end_index,
+                                                   watermarks=self.watermarks, queue=RIFT_GAMES_QUEUES)
+        return (self.__keep_timestamp(m) for m in matches)
+
+    def __keep_timestamp(self, match):
+        # Timestamps of the games found, the watermarks are held below the ones that fail to download
+        game = (match['gameId'], match['platformId'])
+        self.game_timestamps[game] = match['timestamp']
+        return game
+
+    def get_watermarks(self, acc_ids):
+        cursor = self.mongo_watermarks.find({'platform_id': self.region, 'account_id': {'$in': list(acc_ids)}},
+                                            {'_id': 0, 'account_id': 1, 'timestamp': 1})
+        return {w['account_id']: w['timestamp'] for w in cursor}
+
+    def save_watermarks(self):
+        if self.watermarks:
+            self.mongo_watermarks.bulk_write([UpdateOne({'account_id': acc_id, 'platform_id': self.region},
+                                                        {'$max': {'timestamp': timestamp}}, upsert=True)
+                                              for acc_id, timestamp in self.watermarks.items()], ordered=False)
 
     def __save_match_raw_data(self, data):
         if isinstance(data, dict):
-            game_id = str(data['match']['gameId'])
-            platform_id = data['match']['platformId']
-            data['timeline']['gameId'] = game_id
-            data['timeline']['platformId'] = platform_id
-            m_coll = self.mongo_cnx.slds.get_collection(self.league.lower() + '_m')
-            tl_coll = self.mongo_cnx.slds.get_collection(self.league.lower() + '_tl')
-            m_coll.insert_one(data['match'])
-            tl_coll.insert_one(data['timeline'])
+            data['timeline']['gameId'] = data['match']['gameId']
+            data['timeline']['platformId'] = data['match']['platformId']
+            if 'gameVersion' in data['match']:
+                data['match']['patch'] = version_to_patch(data['match']['gameVersion'])
+            self.raw_data_writer.insert(self.league.lower() + '_m', data['match'])
+            self.raw_data_writer.insert(self.league.lower() + '_tl', data['timeline'])
         else:
             raise TypeError('Dict expected at data param. Should be passed as shown here: {"match": match_dict, '
                             '"timeline": timeline_dict}.')
@@ -174,52 +248,181 @@ class DataBase:
         return [abbv[0] for abbv in cursor]
 
     def concat_games(self, df, tl):
+        static_data = get_static_data(self.mongo_static_data)
+        games = tqdm(self.__iter_games(df, tl, raw=self.workers > 1), total=df.shape[0],
+                     desc='\tTransforming JSON into XLSX')
+        return ids_to_names(self.__transform_games(games, tl), static_data)
+
+    def __transform_games(self, games, tl):
+        if self.workers > 1:
+            if self.transformer is None:
+                self.transformer = GameTransformer(self.workers)
+            return self.transformer.transform(games, tl=tl)
+        return games_to_dataframe(games, tl=tl)
+
+    def concat_soloq_games_pushdown(self, **kwargs):
+        # Participant rows are built by the aggregation, only the fields of the export leave the server
+        static_data = get_static_data(self.mongo_static_data)
+        coll, mongo_query, _, _ = self.get_stored_games_query(**kwargs)
+        cursor = coll.aggregate(soloq_participants_pipeline(mongo_query), batchSize=EXPORT_BATCH_SIZE * 10)
+        records = tqdm(cursor, desc='\tTransforming JSON into XLSX', unit=' rows')
+        return ids_to_names(records_to_dataframe(records), static_data)
+
+    def iter_export_chunks(self, df, tl, chunk_size):
+        # Same rows as concat_games, chunk_size games at a time
+        static_data = get_static_data(self.mongo_static_data)
+        # Games are not read from Mongo in bigger batches than the chunks, so they do not add to the memory used either
+        games = self.__iter_games(df, tl, batch_size=min(chunk_size, EXPORT_BATCH_SIZE), raw=self.workers > 1)
+        games = iter(tqdm(games, total=df.shape[0], desc='\tTransforming JSON into XLSX'))
+        while True:
+            chunk = list(islice(games, chunk_size))
+            if not chunk:
+                break
+            yield ids_to_names(self.__transform_games(chunk, tl), static_data)
+
+    def iter_soloq_pushdown_chunks(self, **kwargs):
+        # Same rows as concat_soloq_games_pushdown, the rows of chunk_size games at a time
+        static_data = get_static_data(self.mongo_static_data)
+        coll, mongo_query, _, _ = self.get_stored_games_query(**kwargs)
+        cursor = coll.aggregate(soloq_participants_pipeline(mongo_query),
+                                batchSize=min(kwargs['chunk_size'], EXPORT_BATCH_SIZE) * 10)
+        records = iter(tqdm(cursor, desc='\tTransforming JSON into XLSX', unit=' rows'))
+        while True:
+            chunk = list(islice(records, kwargs['chunk_size'] * 10))
+            if not chunk:
+                break
+            yield ids_to_names(records_to_dataframe(chunk), static_data)
+
+    def __iter_games(self, df, tl, batch_size=EXPORT_BATCH_SIZE, raw=False):
+        # Games are read in batches, the next batch is fetched while the current one is being transformed. Raw games
+        # are left as BSON to be decoded by the workers of the transformer.
+        fetch = self.__fetch_raw_games if raw else self.__fetch_games
+        batches = [df.iloc[i:i + batch_size] for i in range(0, df.shape[0], batch_size)]
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(fetch, batches[0], tl) if batches else None
+            for i, batch in enumerate(batches):
+                matches, timelines = future.result()
+                if i + 1 < len(batches):
+                    future = executor.submit(fetch, batches[i + 1], tl)
+                for _, g in batch.iterrows():
+                    key = (str(g['realm']), str(g['game_id']))
+                    if raw:
+                        yield 'bson', matches.get(key), timelines.get(key), self.__get_game_metadata(g)
+                    else:
+                        yield matches.get(key), timelines.get(key), self.__get_game_metadata(g)
+
+    def __fetch_games(self, batch, tl):
+        m_coll = self.mongo_cnx.slds.get_collection(self.league.lower() + '_m')
+        query = []
+        for realm, games in batch.groupby('realm', sort=False):
+            query.append({'platformId': realm, 'gameId': {'$in': [int(gid) for gid in games['game_id']]}})
+
+        pipeline = [{'$match': {'$or': query}}, {'$project': {'_id': 0}}]
+        if tl:
+            pipeline.append(self.__timelines_lookup())
+        matches, timelines = {}, {}
+        for m in m_coll.aggregate(pipeline, batchSize=EXPORT_BATCH_SIZE):
+            key = (str(m['platformId']), str(m['gameId']))
+            for t in m.pop('timelines', []):
+                timelines[key] = t
+            matches[key] = m
+        return matches, timelines
+
+    def __timelines_lookup(self):
+        # Timelines are joined by gameId and platformId, as ids are only unique per platform, and only their frames
+        # leave the server. The gameId equality uses the index of the timelines, $expr equalities in the pipeline
+        # only do from MongoDB 5.0, which is also the first version allowing both forms in the same $lookup.
+        return {'$lookup': {
+            'from': self.league.lower() + '_tl',
+            'localField': 'gameId',
+            'foreignField': 'gameId',
+            'let': {'platform_id': '$platformId'},
+            'pipeline': [{'$match': {'$expr': {'$eq': ['$platformId', '$$platform_id']}}},
+                         {'$project': {'_id': 0, 'frames': 1, 'gameId': 1, 'platformId': 1}}],
+            'as': 'timelines'}}
+
+    def __fetch_raw_games(self, batch, tl):
+        # Same games as __fetch_games as BSON bytes. Every match is nested in its own field so that only the top level
+        # fields of the documents are decoded here.
+        m_coll = self.mongo_cnx.slds.get_collection(self.league.lower() + '_m',
+                                                    codec_options=CodecOptions(document_class=RawBSONDocument))
+        query = []
+        for realm, games in batch.groupby('realm', sort=False):
+            query.append({'platformId': realm, 'gameId': {'$in': [int(gid) for gid in games['game_id']]}})
+
+        pipeline = [{'$match': {'$or': query}}, {'$project': {'_id': 0}},
+                    {'$replaceRoot': {'newRoot': {'match': '$$ROOT', 'gameId': '$gameId',
+                                                  'platformId': '$platformId'}}}]
+        if tl:
+            pipeline.append(self.__timelines_lookup())
+        matches, timelines = {}, {}
+        for m in m_coll.aggregate(pipeline, batchSize=EXPORT_BATCH_SIZE):
+            key = (str(m['platformId']), str(m['gameId']))
+            for t in m.get('timelines', []):
+                timelines[key] = t.raw
+            matches[key] = m['match'].raw
+        return matches, timelines
+
+    def normalize_game_ids(self):
+        # Timelines used to be stored with their gameId as a string
+        slds = self.mongo_cnx.slds
+        for league in SUPPORTED_LEAGUES:
+            for coll in [slds.get_collection(league.lower() + '_m'), slds.get_collection(league.lower() + '_tl')]:
+                n_games = 0
+                docs = []
+                for doc in coll.find({'gameId': {'$type': 'string'}}, {'_id': 1, 'gameId': 1, 'platformId': 1}):
+                    docs.append(doc)
+                    if len(docs) == BULK_WRITE_BATCH_SIZE:
+                        n_games += self.__int_game_ids(coll, docs)
+                        docs = []
+                if docs:
+                    n_games += self.__int_game_ids(coll, docs)
+                if n_games:
+                    print('\t{}: gameId of {} games converted to int.'.format(coll.name, n_games))
+
+    @staticmethod
+    def __int_game_ids(coll, docs):
+        # String copies of games already stored with an int id are dropped. They are looked up here, the unique index
+        # on the game ids may not exist yet.
+        games = {}
+        for doc in docs:
+            games.setdefault((int(doc['gameId']), doc.get('platformId')), []).append(doc['_id'])
+        stored = set((doc['gameId'], doc.get('platformId')) for doc in coll.find(
+            {'gameId': {'$in': list(set(game_id for game_id, _ in games))}}, {'_id': 0, 'gameId': 1, 'platformId': 1}))
+        operations, duplicated = [], []
+        for (game_id, platform_id), ids in games.items():
+            if (game_id, platform_id) in stored:
+                duplicated += ids
+            else:
+                operations.append(UpdateOne({'_id': ids[0]}, {'$set': {'gameId': game_id}}))
+                duplicated += ids[1:]
+        if operations:
+            coll.bulk_write(operations, ordered=False)
+        if duplicated:
+            coll.delete_many({'_id': {'$in': duplicated}})
+        return len(operations) + len(duplicated)
+
+    def __get_game_metadata(self, g):
         if self.league == 'SLO':
-            return pd.concat([g2df(match=self.mongo_slo_m_col.find_one({'platformId': g[1]['realm'],
-                                                                        'gameId': g[1]['game_id']}, {'_id': 0}),
-                                   timeline=self.mongo_slo_tl_col.find_one({'platformId': str(g[1]['realm']),
-                                                                            'gameId': str(g[1]['game_id'])},
-                                                                           {'_id': 0}),
-                                   custom_names=list(g[1][CUSTOM_PARTICIPANT_COLS].T),
-                                   custom_positions=STANDARD_POSITIONS,
-                                   team_names=list(g[1][['blue', 'red']]),
-                                   custom=(g[1]['hash'] is None),
-                                   week=g[1]['week'],
-                                   database=self.mongo_static_data,
-                                   split=g[1]['split'],
-                                   season=g[1]['season'],
-                                   tl=tl
-                                   ) for g in tqdm(df.iterrows(), total=df.shape[0],
-                                                   desc='\tTransforming JSON into XLSX')])
+            return {'custom_names': list(g[CUSTOM_PARTICIPANT_COLS].T), 'custom_positions': STANDARD_POSITIONS,
+                    'team_names': list(g[['blue', 'red']]), 'custom': (g['hash'] is None), 'week': g['week'],
+                    'split': g['split'], 'season': g['season']}
         elif self.league == 'SCRIMS':
-            return pd.concat([g2df(match=self.mongo_scrims_m_col.find_one({'platformId': g[1]['realm'],
-                                                                           'gameId': g[1]['game_id']}, {'_id': 0}),
-                                   timeline=self.mongo_scrims_tl_col.find_one({'platformId': str(g[1]['realm']),
-                                                                               'gameId': str(g[1]['game_id'])}),
-                                   custom_positions=list(g[1][SCRIMS_POSITIONS_COLS]),
-                                   team_names=list(g[1][['blue', 'red']]),
-                                   custom_names=list(g[1][CUSTOM_PARTICIPANT_COLS]),
-                                   custom=True, enemy=g[1]['enemy'], game_n=g[1]['game_n'], blue_win=g[1]['blue_win'],
-                                   database=self.mongo_static_data, tl=tl
-                                   ) for g in tqdm(df.iterrows(), total=df.shape[0],
-                                                   desc='\tTransforming JSON into XLSX')])
+            return {'custom_positions': list(g[SCRIMS_POSITIONS_COLS]), 'team_names': list(g[['blue', 'red']]),
+                    'custom_names': list(g[CUSTOM_PARTICIPANT_COLS]), 'custom': True, 'enemy': g['enemy'],
+                    'game_n': g['game_n'], 'blue_win': g['blue_win']}
         elif self.league == 'LCK':
-            return pd.concat([g2df(match=None,
-                                   timeline=None,
-                                   week=g[1]['week'], custom=False,
-                                   custom_positions=STANDARD_POSITIONS, database=self.mongo_static_data, tl=tl
-                                   ) for g in tqdm(df.iterrows(), total=df.shape[0],
-                                                   desc='\tTransforming JSON into XLSX')])
-        elif self.league == 'SOLOQ':
-            return pd.concat([g2df(match=self.mongo_soloq_m_col.find_one({'platformId': gid[1][1],
-                                                                          'gameId': int(gid[1][0])}, {'_id': 0}),
-                                   timeline=self.mongo_soloq_tl_col.find_one({'platformId': gid[1][1],
-                                                                              'gameId': str(gid[1][0])}, {'_id': 0}),
-                                   custom=False, database=self.mongo_static_data, tl=tl
-                                   ) for gid in tqdm(df.iterrows(), total=df.shape[0],
-                                                     desc='\tTransforming JSON into XLSX')])
+            return {'week': g['week'], 'custom': False, 'custom_positions': STANDARD_POSITIONS}
+        return {'custom': False}
 
     def get_stored_game_ids(self, **kwargs):
+        coll, mongo_query, game_id, realm = self.get_stored_games_query(**kwargs)
+        games = coll.find(mongo_query, {'_id': 0, game_id: 1, realm: 1})
+        if self.explain:
+            self.__explain(games.clone(), 'Stored games')
+        return [(g[game_id], g[realm]) for g in games]
+
+    def get_stored_games_query(self, **kwargs):
         mongo_query = {}
         if self.league == SOLOQ:
             game_id = 'gameId'
@@ -228,8 +431,12 @@ class DataBase:
             if kwargs['patch'] is not None:
                 patch = kwargs['patch']
                 print('\tLooking for games played on patch {}.'.format(patch))
-                regex_patch = '^' + '{}'.format(patch).replace('.', r'\.')
-                mongo_query['gameVersion'] = {'$regex': regex_patch}
+                if coll.find_one({'patch': {'$exists': False}}, {'_id': 1}) is not None:
+                    # Games stored before the patch field was added at ingest would not match the filter
+                    self.__backfill_patch(coll)
+                mongo_query['patch'] = version_to_patch(patch)
+                if patch.count('.') > 1:
+                    mongo_query['gameVersion'] = {'$regex': '^' + patch.replace('.', r'\.')}
             if kwargs['team_abbv'] is not None or kwargs['competition'] is not None:
                 acc_ids = self.get_account_ids(**kwargs)
                 mongo_query['participantIdentities.player.currentAccountId'] = {'$in': acc_ids}
@@ -272,11 +479,18 @@ class DataBase:
                     mongo_query['timestamp'] = {}
                     mongo_query['timestamp']['$lte'] = timestamp
 
-        games = coll.find(mongo_query, {'_id': 0, game_id: 1, realm: 1})
-        return [(g[game_id], g[realm]) for g in games]
+        return coll, mongo_query, game_id, realm
+
+    def get_db_exporter(self, rebuild=False):
+        return DbExporter(self.mongo_cnx.get_database(EXPORTS_DB_NAME), self.league.lower(), rebuild=rebuild)
 
     def close_connections(self):
-        self.mongo_cnx.close()
+        try:
+            self.raw_data_writer.close()
+        finally:
+            if self.transformer is not None:
+                self.transformer.close()
+            self.mongo_cnx.close()
 
     @staticmethod
     def __str_date_to_timestamp(date, time_delta=None):
@@ -305,6 +519,7 @@ class DataBase:
         self.mongo_static_data.replace_one(filter={'type': 'item'}, replacement=items, upsert=True)
         self.mongo_static_data.replace_one(filter={'type': 'summoner'}, replacement=summs, upsert=True)
         self.mongo_static_data.replace_one(filter={'type': 'runes'}, replacement=runes, upsert=True)
+        invalidate_static_data()
 
     def modify_item_in_db(self, item_type, change_type, item):
         if item_type.lower() in DB_ITEMS and change_type.lower() in DB_CHANGE_TYPE:
@@ -316,6 +531,63 @@ class DataBase:
             elif change_type.lower() == 'remove':
                 coll.delete_one(filter=item)
 
+    def modify_items_in_db(self, item_type, change_type, items):
+        # Same changes as modify_item_in_db, every item in a single bulk write
+        if item_type.lower() in DB_ITEMS and change_type.lower() in DB_CHANGE_TYPE and items:
+            coll = self.mongo_cnx.slds.get_collection(item_type)
+            if change_type.lower() == 'add':
+                operations = [InsertOne(item) for item in items]
+            elif change_type.lower() == 'edit':
+                operations = [ReplaceOne(filter={'key': item['key']}, replacement=item, upsert=True) for item in items]
+            else:
+                operations = [DeleteOne(filter=item) for item in items]
+            return coll.bulk_write(operations)
+
+    def register_players(self, roster_path):
+        roster = pd.read_csv(roster_path, dtype={'player_name': str, 'summoner_name': str})
+        players = []
+        for p in roster[ROSTER_COLS].to_dict(orient='records'):
+            if str(p['region']).upper() not in REGIONS:
+                print('\tRegion {} of {} unknown, the player is not registered.'.format(p['region'], p['player_name']))
+            else:
+                players.append(Player(**p))
+        summoners = self.get_summoners([(REGIONS[p.region.upper()], p.summoner_name) for p in players])
+        items = []
+        for p in players:
+            summoner = summoners.get((REGIONS[p.region.upper()], normalize_summoner_name(p.summoner_name)))
+            if summoner is None:
+                print('\tSummoner {} of {} not found, the player is not registered.'
+                      .format(p.summoner_name, p.player_name))
+            else:
+                items.append(p.get_player(summoner))
+        self.modify_items_in_db('players', 'edit', items)
+        print('\t{} players registered.'.format(len(items)))
+
+    def get_summoners(self, summoners):
+        # (platform, summoner name) -> summoner ids. Names not in the cache are looked up concurrently.
+        cache = SummonerCache()
+        try:
+            found, missing = {}, []
+            for platform, summoner_name in summoners:
+                key = (platform, normalize_summoner_name(summoner_name))
+                if key not in found:
+                    found[key] = cache.get(platform, summoner_name)
+                    if found[key] is None:
+                        missing.append((platform, summoner_name))
+            print('\t{} summoners found in the cache.'.format(len(found) - len(missing)))
+
+            def save(result):
+                platform, summoner_name, summoner = result
+                cache.add(platform, summoner_name, summoner, commit=False)
+                found[(platform, normalize_summoner_name(summoner_name))] = summoner
+
+            self.downloader.download(missing, lambda s: s + (self.downloader.get_summoner(s[1], s[0]),), save,
+                                     desc='\tLooking up summoners')
+            cache.commit()
+            return {key: summoner for key, summoner in found.items() if summoner is not None}
+        finally:
+            cache.close()
+
 
 def create_dirs():
     if not os.path.exists(EXPORTS_DIR):
@@ -328,69 +600,147 @@ def parse_args(args, api_key):
     region = REGIONS[args.region.upper()]
     league = args.league.upper()
     db = DataBase(api_key, region, league)
+    db.explain = args.explain
+    db.workers = args.workers
     try:
+        if args.normalize_game_ids:
+            print('Normalizing game ids.')
+            db.normalize_game_ids()
+
+        if args.ensure_indexes:
+            print('Ensuring indexes.')
+            db.ensure_indexes()
+
         if args.update_static_data:
             db.save_static_data_files()
             print('Static data updated.')
 
+        if args.register_players:
+            print('Registering players.')
+            db.register_players(args.register_players)
+
         if args.download:
             print('Downloading.')
             current_game_ids, new_game_ids = db.get_old_and_new_game_ids(**kwargs)
             db.download_games(current_game_ids=current_game_ids, new_game_ids=new_game_ids)
+            db.save_watermarks()
             print("\tGames downloaded.")
 
         if args.export:
             print('Exporting.')
-            stored_game_ids = db.get_stored_game_ids(**kwargs)
-            print('\t{} games found.'.format(len(stored_game_ids)))
-            if league != SOLOQ:
-                info_df = get_db_generic_dataframe(db.mongo_cnx.slds.get_collection(league.lower()))
-                info_df['gid_realm'] = info_df.apply(lambda x: str(x['game_id']) + '_' + str(x['realm']), axis=1)
-                ls1 = [str(g[0]) + '_' + str(g[1]) for g in stored_game_ids]
-                df = info_df.loc[info_df['gid_realm'].isin(ls1)]
+            if args.pushdown and league == SOLOQ and not args.timeline:
+                if args.stream:
+                    chunks = db.iter_soloq_pushdown_chunks(**kwargs)
+                else:
+                    concatenated_df = db.concat_soloq_games_pushdown(**kwargs)
             else:
-                df = pd.DataFrame(stored_game_ids).rename(columns={0: 'game_id', 1: 'realm'})
+                if args.pushdown:
+                    print('\tThe pushdown export only supports Solo Q games without timeline data, using the default '
+                          'one.')
+                stored_game_ids = db.get_stored_game_ids(**kwargs)
+                print('\t{} games found.'.format(len(stored_game_ids)))
+                if league != SOLOQ:
+                    info_df = get_db_generic_dataframe(db.mongo_cnx.slds.get_collection(league.lower()))
+                    info_df['gid_realm'] = info_df.apply(lambda x: str(x['game_id']) + '_' + str(x['realm']), axis=1)
+                    ls1 = [str(g[0]) + '_' + str(g[1]) for g in stored_game_ids]
+                    df = info_df.loc[info_df['gid_realm'].isin(ls1)]
+                else:
+                    df = pd.DataFrame(stored_game_ids).rename(columns={0: 'game_id', 1: 'realm'})
 
-            concatenated_df = db.concat_games(df, tl=args.timeline)
-            final_df = concatenated_df
+                if args.stream:
+                    chunks = db.iter_export_chunks(df, tl=args.timeline, chunk_size=args.chunk_size)
+                else:
+                    concatenated_df = db.concat_games(df, tl=args.timeline)
 
             # Merge Solo Q players info with data
-            if league == SOLOQ:
-                player_info_df = get_soloq_dataframe(db.mongo_players)
-                final_df = final_df.merge(player_info_df, left_on='currentAccountId', right_on='account_id',
-                                          how='left')
-
+            player_info_df = get_soloq_dataframe(db.mongo_players) if league == SOLOQ else None
             if args.pro_data:
                 print('\tGetting rid of non professional player\'s data.')
-                final_df = final_df[pd.notnull(final_df.player_name)]
 
             outputs = args.output.upper().split(',')
-            if 'XLSX' in outputs:
-                print('\tExporting into XLSX.')
-                if kwargs['file_name'] is not None:
-                    final_df.to_excel(EXPORTS_DIR + kwargs['file_name'] + '.xlsx')
-                else:
-                    final_df.to_excel(LEAGUES_DATA_DICT[league][EXCEL_EXPORT_PATH])
-            if 'CSV' in outputs:
-                print('\tExporting into CSV.')
-                if kwargs['file_name'] is not None:
-                    final_df.to_excel(EXPORTS_DIR + kwargs['file_name'] + '.csv')
-                else:
-                    final_df.to_csv(LEAGUES_DATA_DICT[league][CSV_EXPORT_PATH])
-            if 'DB' in outputs:
-                print('\tExporting into DB.')
-                coll = db.mongo_cnx.exports.get_collection(league.lower())
-                coll.drop()
-                coll.insert_many(final_df.to_dict(orient='records'))
+            if args.stream:
+                export_chunks(db, chunks, outputs, player_info_df, **kwargs)
+            else:
+                final_df = enrich_export(concatenated_df, player_info_df, args.pro_data)
+                # The Dropbox output uploads the same XLSX file, it is only written once
+                if 'XLSX' in outputs or 'DROPBOX' in outputs:
+                    print('\tExporting into XLSX.')
+                    exporter = XlsxExporter(get_xlsx_export_path(league, kwargs['file_name']))
+                    exporter.write(final_df)
+                    exporter.close()
+                if 'CSV' in outputs:
+                    print('\tExporting into CSV.')
+                    if kwargs['file_name'] is not None:
+                        exporter = CsvExporter(EXPORTS_DIR + kwargs['file_name'] + '.csv')
+                    else:
+                        exporter = CsvExporter(LEAGUES_DATA_DICT[league][CSV_EXPORT_PATH])
+                    exporter.write(final_df)
+                    exporter.close()
+                if 'PARQUET' in outputs:
+                    print('\tExporting into Parquet.')
+                    exporter = ParquetExporter(get_parquet_export_path(league, kwargs['file_name']))
+                    exporter.write(final_df)
+                    exporter.close()
+                if 'DB' in outputs:
+                    print('\tExporting into DB.')
+                    exporter = db.get_db_exporter(rebuild=args.rebuild)
+                    exporter.write(final_df)
+                    exporter.close()
             if 'DROPBOX' in outputs:
-                print('\tExporting into XLSX and uploading it to Dropbox.')
-                if kwargs['file_name'] is not None:
-                    final_df.to_excel(EXPORTS_DIR + kwargs['file_name'] + '.xlsx')
-                else:
-                    final_df.to_excel(LEAGUES_DATA_DICT[league][EXCEL_EXPORT_PATH])
+                print('\tUploading the XLSX export to Dropbox.')
+                from connectors import dropbox_upload
                 dropbox_upload.main('exports')
 
             print('\tGames exported.')
 
     finally:
         db.close_connections()
+
+
+def enrich_export(df, player_info_df, pro_data):
+    if player_info_df is not None:
+        df = df.merge(player_info_df, left_on='currentAccountId', right_on='account_id', how='left')
+    if pro_data:
+        df = df[pd.notnull(df.player_name)]
+    return df
+
+
+def get_xlsx_export_path(league, file_name):
+    if file_name is not None:
+        return EXPORTS_DIR + file_name + '.xlsx'
+    return LEAGUES_DATA_DICT[league][EXCEL_EXPORT_PATH]
+
+
+def get_parquet_export_path(league, file_name):
+    if file_name is not None:
+        return EXPORTS_DIR + file_name + '_parquet/'
+    return LEAGUES_DATA_DICT[league][PARQUET_EXPORT_PATH]
+
+
+def export_chunks(db, chunks, outputs, player_info_df, **kwargs):
+    # Every chunk is enriched and appended to the outputs before the next one is transformed, so the memory used
+    # depends on the chunk size and not on the number of games exported
+    league = db.league
+    exporters = []
+    if 'CSV' in outputs:
+        print('\tExporting into CSV.')
+        if kwargs['file_name'] is not None:
+            exporters.append(CsvExporter(EXPORTS_DIR + kwargs['file_name'] + '.csv'))
+        else:
+            exporters.append(CsvExporter(LEAGUES_DATA_DICT[league][CSV_EXPORT_PATH]))
+    if 'PARQUET' in outputs:
+        print('\tExporting into Parquet.')
+        exporters.append(ParquetExporter(get_parquet_export_path(league, kwargs['file_name'])))
+    if 'DB' in outputs:
+        print('\tExporting into DB.')
+        exporters.append(db.get_db_exporter(rebuild=kwargs['rebuild']))
+    if 'XLSX' in outputs or 'DROPBOX' in outputs:
+        print('\tExporting into XLSX.')
+        exporters.append(XlsxExporter(get_xlsx_export_path(league, kwargs['file_name'])))
+
+    for chunk in chunks:
+        chunk = enrich_export(chunk, player_info_df, kwargs['pro_data'])
+        for exporter in exporters:
+            exporter.write(chunk)
+    for exporter in exporters:
+        exporter.close()
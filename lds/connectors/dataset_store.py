@@ -0,0 +1,94 @@
+import os
+from datetime import datetime as dt
+import pandas as pd
+from converters.data2frames import version_to_patch
+from config.constants import DATASETS_DIR
+
+_UNKNOWN_PATCH = 'unknown'
+
+
+class DatasetStore:
+    # Exported rows of a league kept as Parquet files under DATASETS_DIR/<league>/patch=<patch>/. Every append writes
+    # new files with the games not stored yet, files already written are only rewritten to remove games from them.
+    def __init__(self, league, root=DATASETS_DIR):
+        self.path = os.path.join(root, league.lower())
+        self.game_ids = None
+
+    def __partition_path(self, patch):
+        return os.path.join(self.path, 'patch={}'.format(patch))
+
+    def get_patches(self):
+        if not os.path.exists(self.path):
+            return []
+        return sorted(d.split('=', 1)[1] for d in os.listdir(self.path) if d.startswith('patch='))
+
+    def __get_files(self, patches=None):
+        if patches is None:
+            patches = self.get_patches()
+        files = []
+        for patch in patches:
+            partition = self.__partition_path(patch)
+            if os.path.exists(partition):
+                # File names start with the time they were written, so games keep the order they were appended
+                files.extend(os.path.join(partition, f) for f in sorted(os.listdir(partition))
+                             if f.endswith('.parquet'))
+        return files
+
+    def get_game_ids(self):
+        # Only the gameId column is read from every file
+        if self.game_ids is None:
+            self.game_ids = set()
+            for file in self.__get_files():
+                self.game_ids.update(pd.read_parquet(file, columns=['gameId']).gameId.astype(int).tolist())
+        return self.game_ids
+
+    def append(self, df):
+        if df is None or df.empty:
+            return 0
+        known = self.get_game_ids()
+        df = df.loc[~df.gameId.astype(int).isin(known)]
+        if df.empty:
+            return 0
+        if 'gameVersion' in df.columns:
+            patches = df.gameVersion.map(lambda v: version_to_patch(v) if pd.notnull(v) else _UNKNOWN_PATCH)
+        else:
+            patches = pd.Series(_UNKNOWN_PATCH, index=df.index)
+        file_name = 'part-{}.parquet'.format(dt.now().strftime('%Y%m%d%H%M%S%f'))
+        for patch, part in df.groupby(patches, sort=False):
+            os.makedirs(self.__partition_path(patch), exist_ok=True)
+            part.reset_index(drop=True).to_parquet(os.path.join(self.__partition_path(patch), file_name), index=False)
+        new_ids = set(df.gameId.astype(int).tolist())
+        known.update(new_ids)
+        return len(new_ids)
+
+    def iter_read(self, patches=None, game_ids=None):
+        # Only the partitions of the patches asked for are read, one file at a time
+        if game_ids is not None:
+            game_ids = set(map(int, game_ids))
+        for file in self.__get_files(patches):
+            df = pd.read_parquet(file)
+            if game_ids is not None:
+                df = df.loc[df.gameId.astype(int).isin(game_ids)].reset_index(drop=True)
+                if df.empty:
+                    continue
+            yield df
+
+    def read(self, patches=None, game_ids=None):
+        dfs = list(self.iter_read(patches, game_ids))
+        if not dfs:
+            return pd.DataFrame()
+        return pd.concat(dfs, ignore_index=True, sort=False)
+
+    def remove(self, game_ids):
+        game_ids = set(map(int, game_ids))
+        for file in self.__get_files():
+            stored = pd.read_parquet(file, columns=['gameId']).gameId.astype(int)
+            if stored.isin(game_ids).any():
+                df = pd.read_parquet(file)
+                df = df.loc[~df.gameId.astype(int).isin(game_ids)]
+                if df.empty:
+                    os.remove(file)
+                else:
+                    df.to_parquet(file, index=False)
+        if self.game_ids is not None:
+            self.game_ids -= game_ids
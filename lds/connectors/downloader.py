@@ -0,0 +1,235 @@
+import threading
+import time
+from urllib.parse import quote
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from requests.exceptions import HTTPError, ConnectionError, Timeout
+from tqdm import tqdm
+from connectors.http_client import new_session, get_json
+from converters.json_codec import loads
+from config.constants import RIOT_API_URL, MATCH_ENDPOINT, MATCH_TL_ENDPOINT, MATCHLIST_ENDPOINT, \
+    MATCHLIST_PAGE_SIZE, DEFAULT_APP_RATE_LIMITS, DOWNLOAD_WORKERS, DOWNLOAD_MAX_RETRIES, RATE_LIMIT_MARGIN, \
+    TOURNAMENT_GAME_ENDPOINT, TOURNAMENT_TL_ENDPOINT, HTTP_TIMEOUT, SUMMONER_ENDPOINT
+
+
+def parse_rate_limits(header):
+    # '20:1,100:120' -> [(20, 1), (100, 120)]
+    return [tuple(int(v) for v in limit.split(':')) for limit in header.split(',') if limit]
+
+
+class RateLimiter:
+    # One bucket per limit window, a token spent is given back once its window has passed
+    def __init__(self, limits):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.paused_until = 0
+        self.set_limits(limits)
+
+    def set_limits(self, limits):
+        with self.lock:
+            self.buckets = {seconds: (count, self.buckets[seconds][1] if seconds in self.buckets else deque())
+                            for count, seconds in limits}
+
+    def sync(self, counts):
+        # Counts returned by the API include requests made by other clients with the same key
+        with self.lock:
+            now = time.monotonic()
+            for used, seconds in counts:
+                if seconds in self.buckets:
+                    spent = self.buckets[seconds][1]
+                    while len(spent) < used:
+                        spent.append(now)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait_time = self.paused_until - now
+                for seconds, (count, spent) in self.buckets.items():
+                    window = seconds + RATE_LIMIT_MARGIN
+                    while spent and spent[0] <= now - window:
+                        spent.popleft()
+                    if len(spent) >= count:
+                        wait_time = max(wait_time, spent[len(spent) - count] + window - now)
+                if wait_time <= 0:
+                    for _, spent in self.buckets.values():
+                        spent.append(now)
+                    return
+            time.sleep(wait_time)
+
+
+class Downloader:
+    def __init__(self, api_key, api_url=RIOT_API_URL, workers=DOWNLOAD_WORKERS, max_retries=DOWNLOAD_MAX_RETRIES):
+        self.api_url = api_url
+        self.workers = workers
+        self.max_retries = max_retries
+        # Matches are fetched in the download workers while their timelines are fetched here, so both pools
+        # share the connections of the session
+        self.session = new_session(pool_size=workers * 2, headers={'X-Riot-Token': api_key})
+        self.timeline_executor = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.app_limiters = {}
+        self.method_limiters = {}
+
+    def __get_limiters(self, platform, method):
+        with self.lock:
+            if platform not in self.app_limiters:
+                self.app_limiters[platform] = RateLimiter(DEFAULT_APP_RATE_LIMITS)
+            if (platform, method) not in self.method_limiters:
+                # Method limits are unknown until the first response
+                self.method_limiters[(platform, method)] = RateLimiter([])
+            return self.app_limiters[platform], self.method_limiters[(platform, method)]
+
+    def get(self, platform, method, endpoint, **params):
+        app_limiter, method_limiter = self.__get_limiters(platform, method)
+        url = self.api_url.format(platform=platform.lower()) + endpoint
+        for attempt in range(self.max_retries + 1):
+            app_limiter.acquire()
+            method_limiter.acquire()
+            try:
+                r = self.session.get(url, params=params, timeout=HTTP_TIMEOUT)
+            except (ConnectionError, Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+            self.__update_limiters(r.headers, app_limiter, method_limiter)
+            if r.status_code == 429 and attempt < self.max_retries:
+                retry_after = int(r.headers.get('Retry-After', 1))
+                if r.headers.get('X-Rate-Limit-Type') == 'application':
+                    app_limiter.pause(retry_after)
+                else:
+                    method_limiter.pause(retry_after)
+                continue
+            elif r.status_code >= 500 and attempt < self.max_retries:
+                time.sleep(2 ** attempt)
+                continue
+            r.raise_for_status()
+            return loads(r.content)
+
+    @staticmethod
+    def __update_limiters(headers, app_limiter, method_limiter):
+        for limiter, limit_header in [(app_limiter, 'X-App-Rate-Limit'), (method_limiter, 'X-Method-Rate-Limit')]:
+            if limit_header in headers:
+                limiter.set_limits(parse_rate_limits(headers[limit_header]))
+            if limit_header + '-Count' in headers:
+                limiter.sync(parse_rate_limits(headers[limit_header + '-Count']))
+
+    def get_match(self, game_id, platform):
+        return self.get(platform, 'match', MATCH_ENDPOINT.format(id=game_id))
+
+    def get_timeline(self, game_id, platform):
+        return self.get(platform, 'timeline', MATCH_TL_ENDPOINT.format(id=game_id))
+
+    def get_match_and_timeline(self, game_id, platform):
+        timeline = self.timeline_executor.submit(self.get_timeline, game_id, platform)
+        return {'match': self.get_match(game_id, platform), 'timeline': timeline.result()}
+
+    def get_summoner(self, summoner_name, platform):
+        return self.get(platform, 'summoner', SUMMONER_ENDPOINT.format(name=quote(summoner_name)))
+
+    def get_matchlist_page(self, account_id, platform, begin_index, end_index, **params):
+        try:
+            return self.get(platform, 'matchlist', MATCHLIST_ENDPOINT.format(account_id=account_id),
+                            beginIndex=begin_index, endIndex=end_index, **params)['matches']
+        except HTTPError as e:
+            # Accounts without games in the range answer with a 404
+            if e.response is not None and e.response.status_code == 404:
+                return []
+            raise
+
+    def crawl_matchlists(self, account_ids, platform, begin_index=0, end_index=None, watermarks=None, **params):
+        # Yields every match once, as soon as the page where it was found arrives. The pages of an account are
+        # requested one after the other until end_index or a page that is not full, accounts run concurrently.
+        # Accounts with a watermark (timestamp of the newest game already seen) only ask for newer games, page after
+        # page until they reach it whatever end_index is. Watermarks are moved to the newest game found once every
+        # page of the account has been fetched, an account with a failed page keeps its watermark.
+        if end_index is None:
+            end_index = begin_index + MATCHLIST_PAGE_SIZE
+        since = dict(watermarks) if watermarks is not None else {}
+
+        def fetch_page(account_id, begin):
+            if account_id in since:
+                end = begin + MATCHLIST_PAGE_SIZE
+                page_params = dict(params, beginTime=since[account_id] + 1)
+            else:
+                end = min(begin + MATCHLIST_PAGE_SIZE, end_index)
+                page_params = params
+            return begin, end, self.get_matchlist_page(account_id, platform, begin, end, **page_params)
+
+        seen = set()
+        newest = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            accounts = {}
+            for account_id in account_ids:
+                first_page = executor.submit(fetch_page, account_id, 0 if account_id in since else begin_index)
+                accounts[first_page] = account_id
+            pending = set(accounts)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    account_id = accounts.pop(future)
+                    try:
+                        begin, end, matches = future.result()
+                    except HTTPError:
+                        newest.pop(account_id, None)
+                        continue
+                    if matches:
+                        newest[account_id] = max([newest.get(account_id, 0)] + [m['timestamp'] for m in matches])
+                    if len(matches) == end - begin and (account_id in since or end < end_index):
+                        next_page = executor.submit(fetch_page, account_id, end)
+                        accounts[next_page] = account_id
+                        pending.add(next_page)
+                    elif watermarks is not None and account_id in newest:
+                        watermarks[account_id] = max(watermarks.get(account_id, 0), newest.pop(account_id))
+                    for m in matches:
+                        if (m['gameId'], m['platformId']) not in seen:
+                            seen.add((m['gameId'], m['platformId']))
+                            yield m
+
+    def get_tournament_match_and_timeline(self, game_id, tournament, game_hash):
+        timeline = self.timeline_executor.submit(
+            get_json, TOURNAMENT_TL_ENDPOINT.format(tr=tournament, id=game_id, hash=game_hash))
+        match = get_json(TOURNAMENT_GAME_ENDPOINT.format(tr=tournament, id=game_id, hash=game_hash))
+        return {'match': match, 'timeline': timeline.result()}
+
+    def download(self, items, fetch, save, desc='Downloading games'):
+        # Fetches run in the pool, results are saved in the calling thread as soon as they arrive. Items can be a
+        # generator, it is only consumed while there is room for more fetches in flight. Returns the number of items
+        # and the items whose fetch failed.
+        n_items = 0
+        failed = []
+        total = len(items) if hasattr(items, '__len__') else None
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, tqdm(total=total, desc=desc) as bar:
+            it = iter(items)
+            while True:
+                for item in it:
+                    n_items += 1
+                    pending[executor.submit(fetch, item)] = item
+                    if len(pending) >= self.workers * 2:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    try:
+                        save(future.result())
+                    except HTTPError:
+                        failed.append(item)
+                    bar.update()
+        return n_items, failed
+
+
+def hold_watermarks(watermarks, timestamps):
+    # Watermarks are kept below the oldest of the games that failed to download, so that the next sync asks for it
+    # again. Watermarks are only saved when they move forward, the ones already saved are not lowered.
+    if watermarks and timestamps:
+        oldest = min(timestamps)
+        for account_id, timestamp in watermarks.items():
+            watermarks[account_id] = min(timestamp, oldest - 1)
@@ -0,0 +1,151 @@
+import os
+import pandas as pd
+from pymongo import ReplaceOne
+from config.constants import EXPORT_BATCH_SIZE, EXPORT_KEY_FIELDS, EXPORT_HASH_FIELD, EXPORT_STAGING_SUFFIX, \
+    XLSX_MAX_ROWS
+
+
+class CsvExporter:
+    # Chunks are appended to the file, the columns of the first chunk are kept for the rest
+    def __init__(self, path):
+        self.path = path
+        self.columns = None
+        self.n_rows = 0
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+            df.to_csv(self.path, index=False)
+        else:
+            extra = [col for col in df.columns if col not in self.columns]
+            if extra:
+                print('\tColumns {} are not in the CSV header, they are left out.'.format(extra))
+            df.reindex(columns=self.columns).to_csv(self.path, mode='a', header=False, index=False)
+        self.n_rows += len(df)
+
+    def close(self):
+        pass
+
+
+class XlsxExporter:
+    # Rows are written in constant memory mode, every row is flushed to disk once the next one starts. The cell type
+    # of every column is chosen from the dtypes of the first chunk, the columns of the first chunk are kept.
+    def __init__(self, path):
+        # Only exports with an XLSX output load xlsxwriter
+        import xlsxwriter
+        self.path = path
+        self.workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True,
+                                                   'strings_to_formulas': False, 'strings_to_urls': False})
+        self.worksheet = self.workbook.add_worksheet()
+        self.header_format = self.workbook.add_format({'bold': True})
+        self.columns = None
+        self.writers = None
+        self.n_rows = 0
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.writers = [self.__get_writer(df[col]) for col in self.columns]
+            self.worksheet.write_row(0, 0, self.columns, self.header_format)
+        else:
+            extra = [col for col in df.columns if col not in self.columns]
+            if extra:
+                print('\tColumns {} are not in the XLSX header, they are left out.'.format(extra))
+            df = df.reindex(columns=self.columns)
+        if self.n_rows + len(df) >= XLSX_MAX_ROWS:
+            raise ValueError('XLSX files can not hold more than {} rows.'.format(XLSX_MAX_ROWS - 1))
+
+        columns = [df[col].tolist() for col in self.columns]
+        for values in zip(*columns):
+            self.n_rows += 1
+            for col, (writer, value) in enumerate(zip(self.writers, values)):
+                # Nulls (None and NaN) are left as blank cells
+                if value is not None and value == value:
+                    writer(self.n_rows, col, value)
+
+    def __get_writer(self, column):
+        if pd.api.types.is_bool_dtype(column):
+            return self.worksheet.write_boolean
+        elif pd.api.types.is_numeric_dtype(column):
+            return self.__write_number
+        return self.__write_string
+
+    def __write_number(self, row, col, value):
+        try:
+            self.worksheet.write_number(row, col, value)
+        except TypeError:
+            # Chunks after the first one can hold other types in the same column
+            self.worksheet.write(row, col, value)
+
+    def __write_string(self, row, col, value):
+        if isinstance(value, str):
+            self.worksheet.write_string(row, col, value)
+        elif isinstance(value, (bool, int, float)):
+            self.worksheet.write(row, col, value)
+        else:
+            self.worksheet.write_string(row, col, str(value))
+
+    def close(self):
+        self.workbook.close()
+
+
+class ParquetExporter:
+    # One Parquet file per chunk inside the export directory, it is read back as a single dataset
+    def __init__(self, path):
+        self.path = path
+        self.n_parts = 0
+        os.makedirs(path, exist_ok=True)
+        for file in os.listdir(path):
+            if file.endswith('.parquet'):
+                os.remove(os.path.join(path, file))
+
+    def write(self, df):
+        df.reset_index(drop=True).to_parquet(os.path.join(self.path, 'part-{:05d}.parquet'.format(self.n_parts)),
+                                             index=False)
+        self.n_parts += 1
+
+    def close(self):
+        pass
+
+
+class DbExporter:
+    # Rows are upserted by EXPORT_KEY_FIELDS in chunks, rows already exported with the same values are skipped. A
+    # rebuild writes every row into a staging collection that replaces the export once it is closed.
+    def __init__(self, database, name, rebuild=False):
+        self.name = name
+        self.rebuild = rebuild
+        self.coll = database.get_collection(name + EXPORT_STAGING_SUFFIX if rebuild else name)
+        if rebuild:
+            self.coll.drop()
+        self.coll.create_index([(field, 1) for field in EXPORT_KEY_FIELDS], unique=True)
+        self.n_written = 0
+        self.n_unchanged = 0
+
+    def write(self, df):
+        for start in range(0, len(df), EXPORT_BATCH_SIZE):
+            self.__write_chunk(df.iloc[start:start + EXPORT_BATCH_SIZE])
+
+    def __write_chunk(self, chunk):
+        hashes = pd.util.hash_pandas_object(chunk, index=False).values.view('int64').tolist()
+        exported = {}
+        if not self.rebuild:
+            game_ids = chunk.gameId.unique().tolist()
+            projection = dict({field: 1 for field in EXPORT_KEY_FIELDS}, **{EXPORT_HASH_FIELD: 1, '_id': 0})
+            for row in self.coll.find({'gameId': {'$in': game_ids}}, projection):
+                exported[tuple(row.get(field) for field in EXPORT_KEY_FIELDS)] = row.get(EXPORT_HASH_FIELD)
+
+        operations = []
+        for row, row_hash in zip(chunk.to_dict(orient='records'), hashes):
+            key = tuple(row[field] for field in EXPORT_KEY_FIELDS)
+            if exported.get(key) != row_hash:
+                row[EXPORT_HASH_FIELD] = row_hash
+                operations.append(ReplaceOne(dict(zip(EXPORT_KEY_FIELDS, key)), row, upsert=True))
+        if operations:
+            self.coll.bulk_write(operations, ordered=False)
+        self.n_written += len(operations)
+        self.n_unchanged += len(chunk) - len(operations)
+
+    def close(self):
+        if self.rebuild:
+            self.coll.rename(self.name, dropTarget=True)
+        print('\t{} rows written, {} rows unchanged.'.format(self.n_written, self.n_unchanged))
@@ -1,100 +1,113 @@
 from riotwatcher import RiotWatcher
-from converters.data2frames import game_to_dataframe as g2df
-from converters.data2files import write_json, read_json, save_runes_reforged_json
+from converters.data2frames import games_to_dataframe, ids_to_names, version_to_patch
+from converters.data2files import write_json, read_json, read_json_bytes
+from converters.parallel import GameTransformer
+from converters.static_data import get_static_data, invalidate_static_data
+from connectors.catalog import RawDataCatalog
+from connectors.packfile import PackStore
+from connectors.downloader import Downloader, hold_watermarks
+from connectors.http_client import get_runes_reforged_json
+from connectors.dataset_store import DatasetStore
+from connectors.exporters import CsvExporter, XlsxExporter
 import pandas as pd
-from datetime import datetime as dt
 from tqdm import tqdm
+from datetime import datetime as dt, timedelta
 import os
-import urllib.request
-import json
-from itertools import chain
-from requests.exceptions import HTTPError
 from config.constants import RAW_DATA_PATH, EXCEL_EXPORT_PATH, CSV_EXPORT_PATH_MERGED, EXCEL_EXPORT_PATH_MERGED, \
     SCRIMS_POSITIONS_COLS, CUSTOM_PARTICIPANT_COLS, STANDARD_POSITIONS, API_KEY, STATIC_DATA_DIR, LEAGUES_DATA_DICT, \
     CSV_EXPORT_PATH, IDS_FILE_PATH, DTYPES, OFFICIAL_LEAGUE, EXPORTS_DIR, LEAGUES_DATA_DIR, MATCHES_RAW_DATA_DIR, \
-    SOLOQ_GAMES_DIR, LCK_GAMES_DIR, SCRIMS_GAMES_DIR, SLO_GAMES_DIR, REGIONS
+    SOLOQ_GAMES_DIR, LCK_GAMES_DIR, SCRIMS_GAMES_DIR, SLO_GAMES_DIR, REGIONS, BULK_WRITE_BATCH_SIZE
 
 
 class FileSystem:
-    def __init__(self, region, league):
+    def __init__(self, region, league, workers=1):
         self.rw = RiotWatcher(API_KEY)
+        self.downloader = Downloader(API_KEY)
         self.region = region
         self.league = league
+        self.catalogs = {}
+        self.packs = {}
+        self.watermarks = None
+        self.game_timestamps = {}
+        self.transformer = GameTransformer(workers) if workers > 1 else None
+
+    def get_catalog(self, save_dir):
+        if save_dir not in self.catalogs:
+            self.catalogs[save_dir] = RawDataCatalog(save_dir)
+        return self.catalogs[save_dir]
+
+    def get_packs(self, save_dir, create=False):
+        # Games are only packed in the directories converted to packfiles
+        if save_dir not in self.packs and (create or PackStore.exists(save_dir)):
+            self.packs[save_dir] = PackStore(save_dir)
+        return self.packs.get(save_dir)
+
+    def convert_to_packfiles(self, save_dir):
+        # Files are removed once their games are committed to both the packfiles and the catalog
+        catalog = self.get_catalog(save_dir)
+        packs = self.get_packs(save_dir, create=True)
+        packed_files = []
+        for game_id, platform_id, match_file, tl_file in tqdm(catalog.get_unpacked_games(), desc='Packing games'):
+            packs.add_game(read_json(save_dir=save_dir, file_name=match_file),
+                           read_json(save_dir=save_dir, file_name=tl_file), commit=False)
+            catalog.mark_packed(game_id, platform_id, commit=False)
+            packed_files += [match_file, tl_file]
+            if len(packed_files) >= BULK_WRITE_BATCH_SIZE:
+                self.__remove_packed_files(save_dir, packed_files)
+                packed_files = []
+        self.__remove_packed_files(save_dir, packed_files)
+
+    def __remove_packed_files(self, save_dir, files):
+        self.get_packs(save_dir).commit()
+        self.get_catalog(save_dir).commit()
+        for file_name in files:
+            os.remove(os.path.join(save_dir, file_name))
 
     def generate_dataset(self, read_dir, force_update=False, **kwargs):
+        store = self.update_dataset(read_dir, force_update=force_update, **kwargs)
+        df = store.read(patches=kwargs.get('patches'), game_ids=kwargs.get('game_ids'))
+        if df.empty:
+            return None
+        return df
+
+    def update_dataset(self, read_dir, force_update=False, chunk_size=None, **kwargs):
+        # Returns the dataset store, with the games not stored yet transformed and appended chunk_size games at a
+        # time, all at once if it is None.
         if 'game_ids' in kwargs:
-            new = kwargs['game_ids']
-            df = pd.DataFrame({'game_id': new})
+            df = pd.DataFrame({'game_id': kwargs['game_ids']})
         else:
             df = pd.read_csv(LEAGUES_DATA_DICT[self.league][IDS_FILE_PATH],
                              dtype=LEAGUES_DATA_DICT[self.league][DTYPES])
-            new = list(df.game_id.unique())
-        df2 = pd.DataFrame()
-        try:
-            df2 = pd.read_csv('{}'.format(LEAGUES_DATA_DICT[self.league][CSV_EXPORT_PATH]), index_col=0,
-                              encoding="ISO-8859-1")
-            old = list(df2.gameId.unique())
-            new_ids = self.__get_new_ids(old, new)
-        except FileNotFoundError:
-            new_ids = new
-            force_update = True
-
-        df_result = pd.DataFrame()
-        if not force_update:
-            if new_ids:
-                print('There are {} new ids, merging the old data with the new one.'.format(len(new_ids)))
-                if 'game_ids' not in kwargs:
-                    df3 = df[df.game_id.isin(new_ids)]
-                    df4 = self.__concat_games(df3, read_dir)
-                else:
-                    df4 = self.__concat_games(pd.DataFrame({'game_id': new_ids}), read_dir)
-                df_result = pd.concat([df2, df4.T.reset_index().drop_duplicates(subset='index',
-                                                                                keep='first').set_index('index').T])
-                return df_result.reset_index(drop=True)
-            elif not new_ids:
-                return None
-        elif force_update:
-            if new_ids:
-                print('Updating current datasets but there are {} new ids found.'.format(len(new_ids)))
-                df_result = self.__concat_games(df, read_dir).T.reset_index()\
-                    .drop_duplicates(subset='index', keep='first').set_index('index').T
-            elif not new_ids:
-                print('Forcing update of the current datasets even though there are not new ids.')
-                df_result = self.__concat_games(df, read_dir).T.reset_index()\
-                    .drop_duplicates(subset='index', keep='first').set_index('index').T
-
-            return df_result.reset_index(drop=True)
+        store = DatasetStore(self.league)
+        if force_update:
+            print('Forcing update of the current datasets, every game is transformed again.')
+            store.remove(df.game_id.unique())
+        new_ids = self.__get_new_ids(store.get_game_ids(), df.game_id.unique())
+        if new_ids:
+            print('There are {} new ids, adding them to the stored dataset.'.format(len(new_ids)))
+            new_df = df.loc[df.game_id.astype(int).isin(new_ids)]
+            chunk_size = chunk_size or len(new_df)
+            for start in range(0, len(new_df), chunk_size):
+                store.append(self.__concat_games(new_df.iloc[start:start + chunk_size], read_dir))
+        return store
 
     def download_games(self, ids, save_dir):
-        def tournament_match_to_dict(id1, hash1, tournament):
-            with urllib.request.urlopen('https://acs.leagueoflegends.com/v1/stats/game/{tr}/{id}'
-                                        '?gameHash={hash}'.format(tr=tournament, id=id1, hash=hash1)) as url:
-                match = json.loads(url.read().decode())
-            with urllib.request.urlopen('https://acs.leagueoflegends.com/v1/stats/game/{tr}/{id}/timeline'
-                                        '?gameHash={hash}'.format(tr=tournament, id=id1, hash=hash1)) as url:
-                tl = json.loads(url.read().decode())
-            return match, tl
-        file_names = os.listdir(save_dir)
-        curr_ids = list(set([f.split('.')[0].split('_')[1] for f in file_names]))
-        new_ids = self.__get_new_ids(curr_ids, ids)
-        if new_ids:
-            for item in tqdm(new_ids, desc='Downloading games'):
-                try:
-                    if LEAGUES_DATA_DICT[self.league][OFFICIAL_LEAGUE]:
-                        id1 = item.split('#')[0]
-                        tr = item.split('#')[1]
-                        hash1 = item.split('#')[2]
-                        match, timeline = tournament_match_to_dict(id1, hash1, tr)
-                        data = {'match': match, 'timeline': timeline}
-                        self.__save_match_raw_data(data=data, save_dir=save_dir, hash=hash1)
-                    else:
-                        match = self.rw.match.by_id(match_id=item, region=REGIONS[self.region])
-                        timeline = self.rw.match.timeline_by_match(match_id=item, region=REGIONS[self.region])
-                        data = {'match': match, 'timeline': timeline}
-                        self.__save_match_raw_data(data=data, save_dir=save_dir)
-                except HTTPError:
-                    pass
-        else:
+        def fetch(item):
+            if LEAGUES_DATA_DICT[self.league][OFFICIAL_LEAGUE]:
+                id1, tr, hash1 = item.split('#')[:3]
+                return self.downloader.get_tournament_match_and_timeline(id1, tr, hash1), {'hash': hash1}
+            return self.downloader.get_match_and_timeline(item, REGIONS[self.region]), {}
+
+        def save(result):
+            self.__save_match_raw_data(result[0], save_dir, **result[1])
+
+        curr_ids = self.get_catalog(save_dir).get_game_ids()
+        new_ids = self.__iter_new_ids(curr_ids, ids)
+        n_games, failed = self.downloader.download(new_ids, fetch, save)
+        if failed:
+            print('{} games could not be downloaded.'.format(len(failed)))
+            hold_watermarks(self.watermarks, [self.game_timestamps[g] for g in failed if g in self.game_timestamps])
+        if not n_games:
             print('All games already downloaded.')
 
     def __save_match_raw_data(self, data, save_dir, **kwargs):
@@ -104,10 +117,17 @@ class FileSystem:
                                                                    + str(kwargs['hash']))
             else:
                 game_id = str(data['match']['gameId'])
+            packs = self.get_packs(save_dir)
+            if packs is not None:
+                packs.add_game(data['match'], data['timeline'])
+                self.get_catalog(save_dir).add_game(data['match'], game_id, None, None)
+                return
             game_creation = dt.strftime(dt.fromtimestamp(data['match']['gameCreation'] / 1e3), '%d-%m-%y')
-            write_json(data['match'], save_dir=save_dir, file_name='{date}_{id}'.format(date=game_creation, id=game_id))
-            write_json(data['timeline'], save_dir=save_dir, file_name='{date}_{id}_tl'
-                       .format(date=game_creation, id=game_id))
+            match_file = '{date}_{id}.json'.format(date=game_creation, id=game_id)
+            tl_file = '{date}_{id}_tl.json'.format(date=game_creation, id=game_id)
+            write_json(data['match'], save_dir=save_dir, file_name=match_file)
+            write_json(data['timeline'], save_dir=save_dir, file_name=tl_file)
+            self.get_catalog(save_dir).add_game(data['match'], game_id, match_file, tl_file)
         else:
             raise TypeError('Dict expected at data param. Should be passed as shown here: {"match": match_dict, '
                             '"timeline": timeline_dict}.')
@@ -119,70 +139,69 @@ class FileSystem:
             return list(df.game_id.map(str) + '#' + df.tournament + '#' + df.hash)
         elif self.league == 'SOLOQ':
             ids = list(df.account_id)
-            if 'begin_index' in kwargs:
-                begin_index = kwargs['begin_index']
-            else:
-                begin_index = 0
-            return self.__get_soloq_game_ids(acc_ids=ids, n_games=kwargs['n_games'], begin_index=begin_index)
+            return self.__get_soloq_game_ids(acc_ids=ids, n_games=kwargs['n_games'],
+                                             begin_index=kwargs.get('begin_index'))
         return list(df.game_id)
 
-    @staticmethod
-    def __get_file_names_from_match_id(m_id, save_dir):
-        file_names = os.listdir(save_dir)
-        match_filename = [val for val in file_names if str(m_id) in val and 'tl' not in val][0]
-        tl_filename = [val for val in file_names if str(m_id) in val and 'tl' in val][0]
-        return {'match_filename': match_filename.split('.')[0], 'tl_filename': tl_filename.split('.')[0]}
+    def __get_file_names_from_match_id(self, m_id, save_dir):
+        return self.get_catalog(save_dir).get_file_names(m_id)
 
     @staticmethod
     def __get_new_ids(old, new):
         return list(set(map(int, new)) - set(map(int, old)))
 
+    @staticmethod
+    def __iter_new_ids(old, new):
+        old = set(map(int, old))
+        for gid in new:
+            if int(gid) not in old:
+                old.add(int(gid))
+                yield gid
+
     def __concat_games(self, df, read_dir):
+        static_data = get_static_data()
+        if self.transformer is not None:
+            games_df = self.transformer.transform(self.__iter_raw_games(df, read_dir), tl=False)
+        else:
+            games_df = games_to_dataframe(self.__iter_games(df, read_dir))
+        return ids_to_names(games_df, static_data)
+
+    def __iter_games(self, df, read_dir):
+        for _, g in df.iterrows():
+            match, timeline = self.__read_game(g['game_id'], read_dir)
+            yield match, timeline, self.__get_game_metadata(g)
+
+    def __iter_raw_games(self, df, read_dir):
+        # Games are parsed by the workers of the transformer
+        for _, g in df.iterrows():
+            yield self.__read_raw_game(g['game_id'], read_dir) + (self.__get_game_metadata(g),)
+
+    def __read_game(self, game_id, read_dir):
+        packs = self.get_packs(read_dir)
+        if packs is not None and game_id in packs:
+            return packs.read_game(game_id)
+        file_names = self.__get_file_names_from_match_id(m_id=game_id, save_dir=read_dir)
+        return (read_json(save_dir=read_dir, file_name=file_names['match_filename']),
+                read_json(save_dir=read_dir, file_name=file_names['tl_filename']))
+
+    def __read_raw_game(self, game_id, read_dir):
+        packs = self.get_packs(read_dir)
+        if packs is not None and game_id in packs:
+            return ('zjson',) + packs.read_raw_game(game_id, timeline=False)
+        file_names = self.__get_file_names_from_match_id(m_id=game_id, save_dir=read_dir)
+        return 'json', read_json_bytes(save_dir=read_dir, file_name=file_names['match_filename']), None
+
+    def __get_game_metadata(self, g):
         if self.league == 'SLO':
-            return pd.concat([g2df(match=read_json(save_dir=read_dir,
-                                                   file_name=self.__get_file_names_from_match_id(m_id=g[1]['game_id'],
-                                                                                                 save_dir=read_dir)
-                                                   ['match_filename']),
-                                   timeline=read_json(save_dir=read_dir,
-                                                      file_name=self.__get_file_names_from_match_id(
-                                                          m_id=g[1]['game_id'], save_dir=read_dir)['tl_filename']),
-                                   custom_names=list(g[1][CUSTOM_PARTICIPANT_COLS].T),
-                                   custom_positions=STANDARD_POSITIONS,
-                                   team_names=list(g[1][['blue', 'red']]),
-                                   week=g[1]['week'], custom=True) for g in df.iterrows()])
+            return {'custom_names': list(g[CUSTOM_PARTICIPANT_COLS].T), 'custom_positions': STANDARD_POSITIONS,
+                    'team_names': list(g[['blue', 'red']]), 'week': g['week'], 'custom': True}
         elif self.league == 'SCRIMS':
-            return pd.concat([g2df(match=read_json(save_dir=read_dir,
-                                                   file_name=self.__get_file_names_from_match_id(m_id=g[1]['game_id'],
-                                                                                                 save_dir=read_dir)
-                                                   ['match_filename']),
-                                   timeline=read_json(save_dir=read_dir,
-                                                      file_name=self.__get_file_names_from_match_id(
-                                                          m_id=g[1]['game_id'], save_dir=read_dir)['tl_filename']),
-                                   custom_positions=list(g[1][SCRIMS_POSITIONS_COLS]),
-                                   team_names=list(g[1][['blue', 'red']]),
-                                   custom_names=list(g[1][CUSTOM_PARTICIPANT_COLS]),
-                                   custom=True, enemy=g[1]['enemy'], game_n=g[1]['game_n'], blue_win=g[1]['blue_win']
-                                   ) for g in df.iterrows()])
+            return {'custom_positions': list(g[SCRIMS_POSITIONS_COLS]), 'team_names': list(g[['blue', 'red']]),
+                    'custom_names': list(g[CUSTOM_PARTICIPANT_COLS]), 'custom': True, 'enemy': g['enemy'],
+                    'game_n': g['game_n'], 'blue_win': g['blue_win']}
         elif self.league == 'LCK':
-            return pd.concat([g2df(match=read_json(save_dir=read_dir,
-                                                   file_name=self.__get_file_names_from_match_id(m_id=g[1]['game_id'],
-                                                                                                 save_dir=read_dir)
-                                                   ['match_filename']),
-                                   timeline=read_json(save_dir=read_dir,
-                                                      file_name=self.__get_file_names_from_match_id(
-                                                          m_id=g[1]['game_id'], save_dir=read_dir)['tl_filename']),
-                                   week=g[1]['week'], custom=False,
-                                   custom_positions=STANDARD_POSITIONS) for g in df.iterrows()])
-        elif self.league == 'SOLOQ':
-            return pd.concat([g2df(match=read_json(save_dir=read_dir,
-                                                   file_name=self.__get_file_names_from_match_id(m_id=gid,
-                                                                                                 save_dir=read_dir)
-                                                   ['match_filename']),
-                                   timeline=read_json(save_dir=read_dir,
-                                                      file_name=self.__get_file_names_from_match_id(
-                                                          m_id=gid, save_dir=read_dir)['tl_filename']),
-                                   custom=False
-                                   ) for gid in list(df.game_id)])
+            return {'week': g['week'], 'custom': False, 'custom_positions': STANDARD_POSITIONS}
+        return {'custom': False}
 
     def save_static_data_files(self):
         versions = self.rw.static_data.versions(region=REGIONS[self.region])
@@ -197,7 +216,24 @@ class FileSystem:
         summs = self.rw.static_data.summoner_spells(region=REGIONS[self.region], version=versions[0])
         write_json(summs, STATIC_DATA_DIR, file_name='summoners')
 
-        save_runes_reforged_json()
+        write_json(get_runes_reforged_json(versions[0]), STATIC_DATA_DIR, file_name='runes_reforged')
+        invalidate_static_data()
+
+    def close(self):
+        for catalog in self.catalogs.values():
+            catalog.close()
+        for packs in self.packs.values():
+            packs.close()
+        if self.transformer is not None:
+            self.transformer.close()
+
+    @staticmethod
+    def str_date_to_timestamp(date, time_delta=None):
+        if time_delta is not None:
+            dt1 = dt.strptime(date, '%d-%m-%Y') + time_delta
+        else:
+            dt1 = dt.strptime(date, '%d-%m-%Y')
+        return int(dt.timestamp(dt1) * 1e3)
 
     def __get_soloq_game_ids(self, acc_ids, **kwargs):
         if 'n_games' in kwargs:
@@ -205,17 +241,28 @@ class FileSystem:
         else:
             n_games = 20
 
-        if 'begin_index' in kwargs:
+        if kwargs.get('begin_index') is not None:
             begin_index = kwargs['begin_index']
         else:
+            # Only the games newer than the watermark of every account are requested, the watermarks are saved
+            # once the games are downloaded
             begin_index = 0
-        matches = list(chain.from_iterable(
-            [self.rw.match.matchlist_by_account(account_id=acc, begin_index=begin_index,
-                                                end_index=int(begin_index)+int(n_games),
-                                                region=self.region, queue=420)['matches']
-             for acc in acc_ids]))
-        result = list(set([m['gameId'] for m in matches]))
-        return result
+            self.watermarks = self.get_catalog(LEAGUES_DATA_DICT[self.league][RAW_DATA_PATH]) \
+                .get_watermarks(self.region, acc_ids)
+            print('{} accounts synced before, only their new games are requested.'.format(len(self.watermarks)))
+        matches = self.downloader.crawl_matchlists(acc_ids, self.region, begin_index=int(begin_index),
+                                                   end_index=int(begin_index) + int(n_games),
+                                                   watermarks=self.watermarks, queue=420)
+        return (self.__keep_timestamp(m) for m in matches)
+
+    def __keep_timestamp(self, match):
+        # Timestamps of the games found, the watermarks are held below the ones that fail to download
+        self.game_timestamps[match['gameId']] = match['timestamp']
+        return match['gameId']
+
+    def save_watermarks(self, save_dir):
+        if self.watermarks:
+            self.get_catalog(save_dir).set_watermarks(self.region, self.watermarks)
 
 
 def create_dirs():
@@ -251,7 +298,7 @@ def parse_args(args):
         region = args.region.upper()
     else:
         region = 'EUW1'
-    fs = FileSystem(region, league)
+    fs = FileSystem(region, league, workers=args.workers)
     if args.download:
         if league == 'SOLOQ':
             if args.n_games:
@@ -259,50 +306,89 @@ def parse_args(args):
             else:
                 n_games = 20
 
-            if args.begin_index:
-                begin_index = args.begin_index
-            else:
-                begin_index = 0
-            ids = fs.get_league_game_ids(n_games=n_games, begin_index=begin_index)
+            ids = fs.get_league_game_ids(n_games=n_games, begin_index=args.begin_index)
         else:
             ids = fs.get_league_game_ids()
         fs.download_games(ids=ids, save_dir=LEAGUES_DATA_DICT[league][RAW_DATA_PATH])
+        fs.save_watermarks(LEAGUES_DATA_DICT[league][RAW_DATA_PATH])
         print("Games downloaded.")
 
+    if args.convert_packfiles:
+        fs.convert_to_packfiles(LEAGUES_DATA_DICT[league][RAW_DATA_PATH])
+        print("Games packed.")
+
     if args.update_static_data:
         fs.save_static_data_files()
         print("Static data updated.")
 
     if args.export:
+        dataset_kwargs = {}
         if league == 'SOLOQ':
-            files = os.listdir(LEAGUES_DATA_DICT[league][RAW_DATA_PATH])
-            l1 = [f.split('_')[1] for f in files]
-            ids = list(map(int, set([i.split('.')[0] for i in l1])))
-            df = fs.generate_dataset(read_dir=LEAGUES_DATA_DICT[league][RAW_DATA_PATH],
-                                     force_update=args.force_update, game_ids=ids)
+            catalog_kwargs = {'patch': args.patch}
+            if args.begin_time is not None:
+                catalog_kwargs['begin_time'] = fs.str_date_to_timestamp(args.begin_time)
+            if args.end_time is not None:
+                catalog_kwargs['end_time'] = fs.str_date_to_timestamp(args.end_time,
+                                                                      timedelta(hours=23, minutes=59, seconds=59))
+            dataset_kwargs['game_ids'] = fs.get_catalog(LEAGUES_DATA_DICT[league][RAW_DATA_PATH]) \
+                .get_game_ids(**catalog_kwargs)
+            # Only the partitions of the patch exported are read back from the dataset store
+            dataset_kwargs['patches'] = [version_to_patch(args.patch)] if args.patch else None
+
+        if args.stream:
+            store = fs.update_dataset(read_dir=LEAGUES_DATA_DICT[league][RAW_DATA_PATH],
+                                      force_update=args.force_update, chunk_size=args.chunk_size, **dataset_kwargs)
+            # The outputs are written from the stored files one at a time, they are only created if a game is exported
+            exporters = None
+            for df in store.iter_read(patches=dataset_kwargs.get('patches'), game_ids=dataset_kwargs.get('game_ids')):
+                if exporters is None:
+                    exporters = get_exporters(league, args)
+                for exporter in exporters:
+                    exporter.write(df)
+            if exporters is not None:
+                for exporter in exporters:
+                    exporter.close()
+                print("Export finished.")
+            else:
+                print("No export done.")
         else:
             df = fs.generate_dataset(read_dir=LEAGUES_DATA_DICT[league][RAW_DATA_PATH],
-                                     force_update=args.force_update)
-
-        if df is not None:
-            if args.xlsx:
-                df.to_excel('{}'.format(LEAGUES_DATA_DICT[league][EXCEL_EXPORT_PATH]))
-            if args.csv:
-                df.to_csv('{}'.format(LEAGUES_DATA_DICT[league][CSV_EXPORT_PATH]))
-            if not args.csv and not args.xlsx:
-                df.to_excel('{}'.format(LEAGUES_DATA_DICT[league][EXCEL_EXPORT_PATH]))
-                df.to_csv('{}'.format(LEAGUES_DATA_DICT[league][CSV_EXPORT_PATH]))
-            print("Export finished.")
-        else:
-            print("No export done.")
+                                     force_update=args.force_update, **dataset_kwargs)
+            if df is not None:
+                if args.xlsx or not args.csv:
+                    exporter = XlsxExporter(LEAGUES_DATA_DICT[league][EXCEL_EXPORT_PATH])
+                    exporter.write(df)
+                    exporter.close()
+                if args.csv or not args.xlsx:
+                    exporter = CsvExporter(LEAGUES_DATA_DICT[league][CSV_EXPORT_PATH])
+                    exporter.write(df)
+                    exporter.close()
+                print("Export finished.")
+            else:
+                print("No export done.")
 
     if args.merge_soloq and league == 'SOLOQ':
         df1 = pd.read_csv(LEAGUES_DATA_DICT['SOLOQ'][IDS_FILE_PATH], encoding='ISO-8859-1',
                           dtype=LEAGUES_DATA_DICT['SOLOQ']['dtypes'])
-        df2 = pd.read_csv(LEAGUES_DATA_DICT['SOLOQ'][CSV_EXPORT_PATH], index_col=0, encoding='ISO-8859-1')
+        # Exports are written without the index column
+        df2 = pd.read_csv(LEAGUES_DATA_DICT['SOLOQ'][CSV_EXPORT_PATH], encoding='ISO-8859-1')
         df3 = df2[pd.notnull(df2.currentAccountId)]
         df3.currentAccountId = df3.currentAccountId.map(int)
         df4 = df3.merge(df1, left_on='currentAccountId', right_on='account_id', how='left')
-        df4.to_csv(LEAGUES_DATA_DICT['SOLOQ'][CSV_EXPORT_PATH_MERGED])
-        df4.to_excel(LEAGUES_DATA_DICT['SOLOQ'][EXCEL_EXPORT_PATH_MERGED])
+        df4.to_csv(LEAGUES_DATA_DICT['SOLOQ'][CSV_EXPORT_PATH_MERGED], index=False)
+        exporter = XlsxExporter(LEAGUES_DATA_DICT['SOLOQ'][EXCEL_EXPORT_PATH_MERGED])
+        exporter.write(df4)
+        exporter.close()
         print("Solo Q data merged with pro players data.")
+
+    fs.close()
+
+
+def get_exporters(league, args):
+    # Both outputs are written when none is selected
+    exporters = []
+    if args.xlsx or not args.csv:
+        exporters.append(XlsxExporter(LEAGUES_DATA_DICT[league][EXCEL_EXPORT_PATH]))
+    if args.csv or not args.xlsx:
+        exporters.append(CsvExporter(LEAGUES_DATA_DICT[league][CSV_EXPORT_PATH]))
+    return exporters
@@ -0,0 +1,39 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from converters.json_codec import loads
+from config.constants import HTTP_POOL_SIZE, HTTP_TIMEOUT, DATA_DRAGON_URL, DD_LANGUAGE, DD_RUNES_REFORGED
+
+_session = None
+_lock = threading.Lock()
+
+
+def new_session(pool_size=HTTP_POOL_SIZE, headers=None):
+    # Connections are kept alive and reused by every request made through the session, responses are gzip encoded
+    session = requests.Session()
+    session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+    if headers is not None:
+        session.headers.update(headers)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = new_session()
+        return _session
+
+
+def get_json(url, timeout=HTTP_TIMEOUT, **params):
+    r = get_session().get(url, params=params, timeout=timeout)
+    r.raise_for_status()
+    return loads(r.content)
+
+
+def get_runes_reforged_json(version):
+    url = DATA_DRAGON_URL.format(version=version, language=DD_LANGUAGE, endpoint=DD_RUNES_REFORGED)
+    return get_json(url)
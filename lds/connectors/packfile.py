@@ -0,0 +1,101 @@
+import mmap
+import os
+import sqlite3
+from converters.data2files import compress_json, decompress_json
+from config.constants import RAW_DATA_PACKS_DIR, PACK_INDEX, PACK_SEGMENT_SIZE
+
+
+class PackStore:
+    # Every game is appended to the current segment as its compressed match followed by its compressed timeline, the
+    # index keeps where both start and how long they are. Segments are read through memory maps.
+    def __init__(self, save_dir, segment_size=PACK_SEGMENT_SIZE):
+        self.path = os.path.join(save_dir, RAW_DATA_PACKS_DIR)
+        self.segment_size = segment_size
+        os.makedirs(self.path, exist_ok=True)
+        self.cnx = sqlite3.connect(os.path.join(self.path, PACK_INDEX))
+        self.cnx.execute('''
+            CREATE TABLE IF NOT EXISTS games (
+                game_id INTEGER NOT NULL,
+                platform_id TEXT NOT NULL,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                match_length INTEGER NOT NULL,
+                tl_length INTEGER NOT NULL,
+                PRIMARY KEY (game_id, platform_id)
+            )''')
+        self.maps = {}
+        self.segment = self.cnx.execute('SELECT MAX(segment) FROM games').fetchone()[0] or 0
+        self.file = None
+
+    @staticmethod
+    def exists(save_dir):
+        return os.path.exists(os.path.join(save_dir, RAW_DATA_PACKS_DIR, PACK_INDEX))
+
+    def __segment_path(self, segment):
+        return os.path.join(self.path, 'segment-{:05d}.pack'.format(segment))
+
+    def add_game(self, match, timeline, commit=True):
+        match_data = compress_json(match)
+        tl_data = compress_json(timeline)
+        if self.file is None:
+            self.file = open(self.__segment_path(self.segment), 'ab')
+        offset = self.file.tell()
+        if offset and offset + len(match_data) + len(tl_data) > self.segment_size:
+            self.file.close()
+            self.segment += 1
+            self.file = open(self.__segment_path(self.segment), 'ab')
+            offset = 0
+        self.file.write(match_data)
+        self.file.write(tl_data)
+        self.file.flush()
+        self.cnx.execute('INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?)',
+                         (match['gameId'], str(match['platformId']), self.segment, offset, len(match_data),
+                          len(tl_data)))
+        if commit:
+            self.cnx.commit()
+
+    def commit(self):
+        self.cnx.commit()
+
+    def __contains__(self, game_id):
+        return self.cnx.execute('SELECT 1 FROM games WHERE game_id = ?', (int(game_id),)).fetchone() is not None
+
+    def __get_map(self, segment, end):
+        # The current segment keeps growing, it is mapped again when a game is past the end of the old map
+        mm = self.maps.get(segment)
+        if mm is None or len(mm) < end:
+            if mm is not None:
+                mm.close()
+            with open(self.__segment_path(segment), 'rb') as fp:
+                mm = self.maps[segment] = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return mm
+
+    def read_game(self, game_id, timeline=True):
+        match_data, tl_data = self.read_raw_game(game_id, timeline=timeline)
+        return decompress_json(match_data), decompress_json(tl_data) if timeline else None
+
+    def read_raw_game(self, game_id, timeline=True):
+        # Compressed records, as stored
+        row = self.cnx.execute('SELECT segment, offset, match_length, tl_length FROM games WHERE game_id = ?',
+                               (int(game_id),)).fetchone()
+        if row is None:
+            raise KeyError('Game {} not found in the packfiles of {}.'.format(game_id, self.path))
+        segment, offset, match_length, tl_length = row
+        mm = self.__get_map(segment, offset + match_length + tl_length)
+        match_data = mm[offset:offset + match_length]
+        if not timeline:
+            return match_data, None
+        return match_data, mm[offset + match_length:offset + match_length + tl_length]
+
+    def iter_matches(self):
+        for (game_id,) in self.cnx.execute('SELECT game_id FROM games ORDER BY segment, offset').fetchall():
+            yield self.read_game(game_id, timeline=False)[0]
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        for mm in self.maps.values():
+            mm.close()
+        self.maps = {}
+        self.cnx.close()
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import time
+from config.constants import SUMMONER_CACHE_PATH, SUMMONER_CACHE_TTL
+
+
+def normalize_summoner_name(summoner_name):
+    # Summoner names are unique per platform without taking case and spaces into account
+    return summoner_name.replace(' ', '').lower()
+
+
+class SummonerCache:
+    # Ids of the summoners looked up by name, a summoner older than ttl seconds is looked up again as names can be
+    # changed or taken by another account
+    def __init__(self, path=SUMMONER_CACHE_PATH, ttl=SUMMONER_CACHE_TTL):
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.cnx = sqlite3.connect(path)
+        self.cnx.execute('''
+            CREATE TABLE IF NOT EXISTS summoners (
+                platform_id TEXT NOT NULL,
+                summoner_name TEXT NOT NULL,
+                id TEXT NOT NULL,
+                account_id TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (platform_id, summoner_name)
+            )''')
+
+    def get(self, platform_id, summoner_name):
+        row = self.cnx.execute('SELECT id, account_id FROM summoners WHERE platform_id = ? AND summoner_name = ? '
+                               'AND updated_at > ?', (platform_id, normalize_summoner_name(summoner_name),
+                                                      time.time() - self.ttl)).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'accountId': row[1]}
+
+    def add(self, platform_id, summoner_name, summoner, commit=True):
+        self.cnx.execute('INSERT OR REPLACE INTO summoners VALUES (?, ?, ?, ?, ?)',
+                         (platform_id, normalize_summoner_name(summoner_name), summoner['id'], summoner['accountId'],
+                          time.time()))
+        if commit:
+            self.cnx.commit()
+
+    def commit(self):
+        self.cnx.commit()
+
+    def close(self):
+        self.cnx.close()
@@ -1,31 +1,33 @@
-import json
-from config.constants import STATIC_DATA_DIR, DD_LANGUAGE, DD_RUNES_REFORGED, DATA_DRAGON_URL
-import requests
+import zlib
+from converters.json_codec import loads, dumps
+from config.constants import PACK_COMPRESSION_LEVEL
 
 
 def write_json(data, save_dir, file_name):
     if '.json' in file_name:
-        with open('{dir}/{name}'.format(dir=save_dir, name=file_name), 'w') as fp:
-            json.dump(data, fp)
+        with open('{dir}/{name}'.format(dir=save_dir, name=file_name), 'wb') as fp:
+            fp.write(dumps(data))
     else:
-        with open('{dir}/{name}.json'.format(dir=save_dir, name=file_name), 'w') as fp:
-            json.dump(data, fp)
+        with open('{dir}/{name}.json'.format(dir=save_dir, name=file_name), 'wb') as fp:
+            fp.write(dumps(data))
 
 
 def read_json(save_dir, file_name):
+    return loads(read_json_bytes(save_dir, file_name))
+
+
+def read_json_bytes(save_dir, file_name):
     if '.json' in file_name:
-        with open('{dir}/{name}'.format(dir=save_dir, name=file_name), 'r') as fp:
-            return json.load(fp)
+        with open('{dir}/{name}'.format(dir=save_dir, name=file_name), 'rb') as fp:
+            return fp.read()
     else:
-        with open('{dir}/{name}.json'.format(dir=save_dir, name=file_name), 'r') as fp:
-            return json.load(fp)
+        with open('{dir}/{name}.json'.format(dir=save_dir, name=file_name), 'rb') as fp:
+            return fp.read()
 
 
-def get_runes_reforged_json(version):
-    url = DATA_DRAGON_URL.format(version=version, language=DD_LANGUAGE, endpoint=DD_RUNES_REFORGED)
-    r = requests.get(url)
-    return r.json()
+def compress_json(data, level=PACK_COMPRESSION_LEVEL):
+    return zlib.compress(dumps(data), level)
 
 
-def save_runes_reforged_json():
-    write_json(get_runes_reforged_json(), save_dir=STATIC_DATA_DIR, file_name='runes_reforged')
+def decompress_json(data):
+    return loads(zlib.decompress(data))
@@ -1,373 +1,253 @@
-from itertools import chain
+import numpy as np
 import pandas as pd
-import datetime
-from converters.kwargs2whatever import export_dataset_kwargs
-from config.constants import STATIC_DATA_RELEVANT_COLS, STATIC_DATA_DIR, ITEMS_COLS, SUMMS_COLS, RUNES_COLS, BANS_COLS
+from dateutil.tz import tzlocal
+from converters.kwargs2whatever import export_record_kwargs
+from config.constants import STATIC_DATA_RELEVANT_COLS, STATIC_DATA_DIR, ITEMS_COLS, SUMMS_COLS, RUNES_COLS, \
+    BANS_COLS, TIMELINE_DELTAS_COLS, TIMELINE_DERIVED_METRICS, TIMELINE_THRESHOLDS, TIMELINE_SNAPSHOTS, \
+    TIMELINE_EVENT_COUNTERS
 from converters.data2files import read_json
 
 
-def game_to_dataframe(match, timeline, **kwargs):
-    def timestamp_to_readable_time(seconds):
-        m, s = divmod(seconds, 60)
-        h, m = divmod(m, 60)
-
-        return "{h}:{m}:{s}".format(h=int(h), m=int(m), s=int(s))
-
-    def ids_to_names(df, database=None):
-        if database is None:
-            champs = champs_to_dataframe(read_json(save_dir=STATIC_DATA_DIR, file_name='champions'))
-            items = items_to_dataframe(read_json(save_dir=STATIC_DATA_DIR, file_name='items'))
-            summs = summs_to_dataframe(read_json(save_dir=STATIC_DATA_DIR, file_name='summoners'))
-            runes = runes_reforged_to_dataframe()
-        else:
-            champs = champs_to_dataframe(database.find_one({'type': 'champion'}, {'_id': 0}))
-            items = items_to_dataframe(database.find_one({'type': 'item'}, {'_id': 0}))
-            summs = summs_to_dataframe(database.find_one({'type': 'summoner'}, {'_id': 0}))
-            runes = runes_reforged_to_dataframe(data=database.find_one({'type': 'runes'}, {'_id': 0})['runes'])
-
-        df1 = df.merge(
-            champs.rename(columns={'name': 'champ_name'}), left_on='championId', right_on='key').drop('key', axis=1)
-        # Items
-        df2 = df1
-        for name in ITEMS_COLS:
-            df2 = df2.merge(items.rename(columns={'name': '{}_name'.format(name)}), left_on='{}'.format(name),
-                            right_on='id', how='left').drop('id', axis=1)
-        # Summoner spells
-        df3 = df2
-        for name in SUMMS_COLS:
-            df3 = df3.merge(summs.rename(columns={'name': '{}_name'.format(name)}), left_on='{}'.format(name),
-                            right_on='key', how='left').drop('key', axis=1)
-        # Runes
-        df4 = df3
-        try:
-            for name in RUNES_COLS:
-                df4 = df4.merge(runes.rename(columns={'name': '{}_name'.format(name)}), left_on='{}'.format(name),
-                                right_on='id', how='left').drop('id', axis=1)
-        except KeyError:
-            pass
-        # Bans
-        df5 = df4
-        for name in BANS_COLS:
-            df5 = df5.merge(champs.rename(columns={'name': '{}_name'.format(name)}), left_on='{}'.format(name),
-                            right_on='key', how='left').drop('key', axis=1)
-
-        return df5
-
-    # def calculate_diffs(df):
-    participants = match.pop('participants')
-    participant_ids = match.pop('participantIdentities')
-    teams = match.pop('teams')
-    m_df = pd.DataFrame(match, index=range(0, 10))
-    ps_ids_df = game_participant_ids_to_dataframe(participant_ids, custom=kwargs['custom'])
-    ps_df = game_participants_to_dataframe(participants)
-    t_df = game_teams_to_dataframe(teams)
-    if kwargs['tl']:
-        tl_df = timeline_relevant_stats_to_dataframe(timeline)
-        df_concat = pd.concat([m_df, ps_ids_df, ps_df, t_df, tl_df], axis=1)
-    else:
-        df_concat = pd.concat([m_df, ps_ids_df, ps_df, t_df], axis=1)
-
-    if kwargs:
-        df_result = export_dataset_kwargs(df_concat, kwargs)
-    else:
-        df_result = df_concat
-
-    df_result.gameCreation = df_result.gameCreation.apply(
-        lambda x: datetime.datetime.fromtimestamp(x / 1e3).strftime('%Y-%m-%d %H:%M:%S'))
-    df_result['game_duration_time'] = df_result.gameDuration.apply(timestamp_to_readable_time)
-    if 'database' in kwargs:
-        df_result2 = ids_to_names(df_result, database=kwargs['database'])
-    else:
-        df_result2 = ids_to_names(df_result)
-    return df_result2.T.reset_index().drop_duplicates(subset='index', keep='first').set_index('index').T
-
+class ColumnBuilder:
+    def __init__(self):
+        self.columns = {}
+        self.n_rows = 0
+
+    def append(self, record):
+        for key, value in record.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.n_rows
+            column.append(value)
+        self.n_rows += 1
+        # Columns missing in this record get a null value to keep every list the same length.
+        if len(record) != len(self.columns):
+            for column in self.columns.values():
+                if len(column) < self.n_rows:
+                    column.append(None)
+
+    def extend(self, columns, n_rows):
+        # Adds the columns of another builder after the rows of this one, keeping the order columns first appear in
+        for key, values in columns.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.n_rows
+            column.extend(values)
+        self.n_rows += n_rows
+        for column in self.columns.values():
+            if len(column) < self.n_rows:
+                column.extend([None] * (self.n_rows - len(column)))
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.columns)
+
+
+def games_to_dataframe(games, tl=False):
+    return records_to_dataframe(record for match, timeline, metadata in games
+                                for record in game_to_records(match, timeline, tl=tl, **metadata))
+
+
+def records_to_dataframe(records):
+    builder = ColumnBuilder()
+    for record in records:
+        builder.append(record)
+    return builder_to_dataframe(builder)
+
+
+def builder_to_dataframe(builder):
+    df = builder.to_dataframe()
+    if not df.empty:
+        df['gameCreation'] = pd.to_datetime(df.gameCreation, unit='ms', utc=True).dt.tz_convert(tzlocal())\
+            .dt.strftime('%Y-%m-%d %H:%M:%S')
+        df['game_duration_time'] = seconds_to_readable_time(df.gameDuration)
+    return df
 
-def game_participants_to_dataframe(participants):
-    stats = [p.pop('stats') for p in participants]
-    timeline = [p.pop('timeline') for p in participants]
 
-    # Old matches
+def game_to_records(match, timeline, tl=False, **kwargs):
+    participants = match['participants']
+    match_info = {k: v for k, v in match.items() if k not in ('participants', 'participantIdentities', 'teams')}
+    ps_ids = game_participant_ids_to_records(match['participantIdentities'], custom=kwargs['custom'])
+    ps = game_participants_to_records(participants)
+    teams = game_teams_to_records(match['teams'])
+    if tl:
+        tl_stats = timeline_relevant_stats_to_records(timeline)
+
+    records = []
+    for i in range(0, len(participants)):
+        record = dict(match_info)
+        add_missing_fields(record, ps_ids[i])
+        add_missing_fields(record, ps[i])
+        add_missing_fields(record, teams[i])
+        if tl:
+            add_missing_fields(record, tl_stats[i])
+        records.append(export_record_kwargs(record, i, kwargs))
+    return records
+
+
+def add_missing_fields(record, fields):
+    # Fields repeated between blocks (participantId, ...) keep the first value and position.
+    for key, value in fields.items():
+        if key not in record:
+            record[key] = value
+
+
+def seconds_to_readable_time(seconds):
+    h = (seconds // 3600).astype(int).astype(str)
+    m = (seconds % 3600 // 60).astype(int).astype(str)
+    s = (seconds % 60).astype(int).astype(str)
+    return h + ':' + m + ':' + s
+
+
+def version_to_patch(version):
+    # '9.3.258.6789' -> '9.3'
+    return '.'.join(str(version).split('.')[:2])
+
+
+def ids_to_names(df, static_data):
+    champ_names = static_data.champ_names
+    item_names = static_data.item_names
+    summ_names = static_data.summ_names
+    rune_names = static_data.rune_names
+
+    names = {'champ_name': df.championId.map(champ_names)}
+    for name in ITEMS_COLS:
+        names['{}_name'.format(name)] = df[name].map(item_names)
+    for name in SUMMS_COLS:
+        names['{}_name'.format(name)] = df[name].map(summ_names)
+    # Old matches don't have runes reforged
+    for name in RUNES_COLS:
+        if name in df.columns:
+            names['{}_name'.format(name)] = df[name].map(rune_names)
+    for name in BANS_COLS:
+        names['{}_name'.format(name)] = df[name].map(champ_names)
+
+    df_result = pd.concat([df, pd.DataFrame(names, index=df.index)], axis=1)
+    # Same as the former inner merge on championId: players with an unknown champion are left out and the index is
+    # numbered again.
+    return df_result.loc[names['champ_name'].notnull()].reset_index(drop=True)
+
+
+def game_participants_to_records(participants):
+    records = []
     for p in participants:
-        try:
-            _ = p.pop('masteries')
-        except KeyError:
-            pass
-        try:
-            _ = p.pop('runes')
-        except KeyError:
-            pass
-
-    df1 = pd.concat([pd.DataFrame(p, index=(i,)) for i, p in enumerate(participants)])
-    df2 = pd.concat([pd.DataFrame(s, index=(i,)) for i, s in enumerate(stats)])
-    df3 = pd.concat([game_timeline_to_dataframe(t) for i, t in enumerate(timeline)])
-    return pd.concat([df1, df2, df3], axis=1)
+        # Old matches have masteries and runes
+        record = {k: v for k, v in p.items() if k not in ('stats', 'timeline', 'masteries', 'runes')}
+        add_missing_fields(record, p['stats'])
+        add_missing_fields(record, game_timeline_to_record(p['timeline']))
+        records.append(record)
+    return records
 
 
-def game_participant_ids_to_dataframe(participant_ids, custom):
+def game_participant_ids_to_records(participant_ids, custom):
     if not custom:
         # Not good. Have to change it to support and adapt to further changes.
         try:
-            return pd.concat([pd.DataFrame({'participantId': p['participantId'],
-                                            'summonerName': p['player']['summonerName'],
-                                            'accountId': p['player']['accountId'],
-                                            'currentAccountId': p['player']['currentAccountId'],
-                                            'summonerId': p['player']['summonerId']},
-                                           index=(i,)) for i, p in enumerate(participant_ids)])
+            return [{'participantId': p['participantId'],
+                     'summonerName': p['player']['summonerName'],
+                     'accountId': p['player']['accountId'],
+                     'currentAccountId': p['player']['currentAccountId'],
+                     'summonerId': p['player']['summonerId']} for p in participant_ids]
         except KeyError:
             pass
         try:
-            return pd.concat([pd.DataFrame({'participantId': p['participantId'],
-                                            'summonerName': p['player']['summonerName']},
-                                           index=(i,)) for i, p in enumerate(participant_ids)])
+            return [{'participantId': p['participantId'],
+                     'summonerName': p['player']['summonerName']} for p in participant_ids]
         except KeyError:
             pass
-    return pd.concat([pd.DataFrame(p_id, index=(i,)) for i, p_id in enumerate(participant_ids)])
-
-
-def game_timeline_to_dataframe(timeline):
-    columns = ["lane", "role", "participantId", "cspm0_10", "cspm10_20", "cspm20_30", "cspm30_end",
-               "csdiffpm0_10", "csdiffpm10_20", "csdiffpm20_30", "csdiffpm30_end", "dmgtpm0_10",
-               "dmgtpm10_20", "dmgtpm20_30", "dmgtpm30_end", "dmgtdiffpm0_10", "dmgtdiffpm10_20",
-               "dmgtdiffpm20_30", "dmgtdiffpm30_end", "xppm0_10", "xppm10_20", "xppm20_30",
-               "xppm30_end", "xpdiffpm0_10", "xpdiffpm10_20", "xpdiffpm20_30", "xpdiffpm30_end"]
-    participant_id = timeline["participantId"]
-    tl_df = pd.DataFrame(index=(participant_id - 1,), columns=columns)
-    try:
-        tl_df["cspm0_10"] = timeline["creepsPerMinDeltas"]["0-10"]
-    except:
-        tl_df["cspm0_10"] = None
-    try:
-        tl_df["cspm10_20"] = timeline["creepsPerMinDeltas"]["10-20"]
-    except:
-        tl_df["cspm10_20"] = None
-    try:
-        tl_df["cspm20_30"] = timeline["creepsPerMinDeltas"]["20-30"]
-    except:
-        tl_df["cspm20_30"] = None
-    try:
-        tl_df["cspm30_end"] = timeline["creepsPerMinDeltas"]["30-end"]
-    except:
-        tl_df["cspm30_end"] = None
-    try:
-        tl_df["csdiffpm0_10"] = timeline["csDiffPerMinDeltas"]["0-10"]
-    except:
-        tl_df["csdiffpm0_10"] = None
-    try:
-        tl_df["csdiffpm10_20"] = timeline["csDiffPerMinDeltas"]["10-20"]
-    except:
-        tl_df["csdiffpm10_20"] = None
-    try:
-        tl_df["csdiffpm20_30"] = timeline["csDiffPerMinDeltas"]["20-30"]
-    except:
-        tl_df["csdiffpm20_30"] = None
-    try:
-        tl_df["csdiffpm30_end"] = timeline["csDiffPerMinDeltas"]["30-end"]
-    except:
-        tl_df["csdiffpm30_end"] = None
-    try:
-        tl_df["dmgtpm0_10"] = timeline["damageTakenPerMinDeltas"]["0-10"]
-    except:
-        tl_df["dmgtpm0_10"] = None
-    try:
-        tl_df["dmgtpm10_20"] = timeline["damageTakenPerMinDeltas"]["10-20"]
-    except:
-        tl_df["dmgtpm10_20"] = None
-    try:
-        tl_df["dmgtpm20_30"] = timeline["damageTakenPerMinDeltas"]["20-30"]
-    except:
-        tl_df["dmgtpm20_30"] = None
-    try:
-        tl_df["dmgtpm30_end"] = timeline["damageTakenPerMinDeltas"]["30-end"]
-    except:
-        tl_df["dmgtpm30_end"] = None
-    try:
-        tl_df["dmgtdiffpm0_10"] = timeline["damageTakenDiffPerMinDeltas"]["0-10"]
-    except:
-        tl_df["dmgtdiffpm0_10"] = None
-    try:
-        tl_df["dmgtdiffpm10_20"] = timeline["damageTakenDiffPerMinDeltas"]["10-20"]
-    except:
-        tl_df["dmgtdiffpm10_20"] = None
-    try:
-        tl_df["dmgtdiffpm20_30"] = timeline["damageTakenDiffPerMinDeltas"]["20-30"]
-    except:
-        tl_df["dmgtdiffpm20_30"] = None
-    try:
-        tl_df["dmgtdiffpm30_end"] = timeline["damageTakenDiffPerMinDeltas"]["30-end"]
-    except:
-        tl_df["dmgtdiffpm30_end"] = None
-    try:
-        tl_df["gpm0_10"] = timeline["goldPerMinDeltas"]["0-10"]
-    except:
-        tl_df["gpm0_10"] = None
-    try:
-        tl_df["gpm10_20"] = timeline["goldPerMinDeltas"]["10-20"]
-    except:
-        tl_df["gpm10_20"] = None
-    try:
-        tl_df["gpm20_30"] = timeline["goldPerMinDeltas"]["20-30"]
-    except:
-        tl_df["gpm20_30"] = None
-    try:
-        tl_df["gpm30_end"] = timeline["goldPerMinDeltas"]["30-end"]
-    except:
-        tl_df["gpm30_end"] = None
-    try:
-        tl_df["xppm0_10"] = timeline["xpPerMinDeltas"]["0-10"]
-    except:
-        tl_df["xppm0_10"] = None
-    try:
-        tl_df["xppm10_20"] = timeline["xpPerMinDeltas"]["10-20"]
-    except:
-        tl_df["xppm10_20"] = None
-    try:
-        tl_df["xppm20_30"] = timeline["xpPerMinDeltas"]["20-30"]
-    except:
-        tl_df["xppm20_30"] = None
-    try:
-        tl_df["xppm30_end"] = timeline["xpPerMinDeltas"]["30-end"]
-    except:
-        tl_df["xppm30_end"] = None
-    try:
-        tl_df["xpdiffpm0_10"] = timeline["xpDiffPerMinDeltas"]["0-10"]
-    except:
-        tl_df["xpdiffpm0_10"] = None
-    try:
-        tl_df["xpdiffpm10_20"] = timeline["xpDiffPerMinDeltas"]["10-20"]
-    except:
-        tl_df["xpdiffpm10_20"] = None
-    try:
-        tl_df["xpdiffpm20_30"] = timeline["xpDiffPerMinDeltas"]["20-30"]
-    except:
-        tl_df["xpdiffpm20_30"] = None
-    try:
-        tl_df["xpdiffpm30_end"] = timeline["xpDiffPerMinDeltas"]["30-end"]
-    except:
-        tl_df["xpdiffpm30_end"] = None
-    tl_df["lane"] = timeline["lane"]
-    tl_df["role"] = timeline["role"]
-    tl_df["participantId"] = participant_id
-
-    return tl_df
-
-
-def game_teams_to_dataframe(teams):
-    t1bans = [i['championId'] for i in teams[0].pop('bans')]
-    t2bans = [i['championId'] for i in teams[1].pop('bans')]
-    while len(t1bans) < 5:
-        t1bans.append(0)
-    while len(t2bans) < 5:
-        t2bans.append(0)
-    t1 = pd.DataFrame(teams[0], index=range(0, 5))
-    t2 = pd.DataFrame(teams[1], index=range(5, 10))
-    t1['ban1'], t1['ban2'], t1['ban3'], t1['ban4'], t1['ban5'] = t1bans
-    t2['ban1'], t2['ban2'], t2['ban3'], t2['ban4'], t2['ban5'] = t2bans
-    t1.columns = [c + '_team' for c in t1.columns]
-    t2.columns = [c + '_team' for c in t2.columns]
-    return pd.concat([t1, t2])
-
-
-def timeline_participant_stats_to_dataframe(timeline):
-    tl_frames = timeline['frames']
-    tl_participants = [frame['participantFrames'] for frame in tl_frames]
-    tl_ps_df = pd.concat(
-        [pd.DataFrame(stats, index=(i,))
-         for i, p in enumerate(tl_participants)
-         for p_id, stats in p.items()])
-    return tl_ps_df.reset_index().rename(columns={'index': 'frame'})
-
-
-def timeline_relevant_stats_to_dataframe(timeline):
-    def timeto_stats_from_participant(p):
-        l4k = list(p[p.totalGold >= 4000].head(1).frame)
-        l7k = list(p[p.totalGold >= 7000].head(1).frame)
-        l50cs = list(p[p.minionsKilled >= 50].head(1).frame)
-        l100cs = list(p[p.minionsKilled >= 100].head(1).frame)
-        l50jcs = list(p[p.jungleMinionsKilled >= 50].head(1).frame)
-        l100jcs = list(p[p.jungleMinionsKilled >= 100].head(1).frame)
-        l50ccs = list(p[p.minionsKilled + p.jungleMinionsKilled >= 50].head(1).frame)
-        l100ccs = list(p[p.minionsKilled + p.jungleMinionsKilled >= 100].head(1).frame)
-        l6lvl = list(p[p.level >= 6].head(1).frame)
-        l11lvl = list(p[p.level >= 11].head(1).frame)
-        f5 = p[p.frame == 5]
-        f10 = p[p.frame == 10]
-        f15 = p[p.frame == 15]
-        f20 = p[p.frame == 20]
-        g5 = list(f5.totalGold)
-        g10 = list(f10.totalGold)
-        g15 = list(f15.totalGold)
-        g20 = list(f20.totalGold)
-        ccs5 = list(f5.minionsKilled + f5.jungleMinionsKilled)
-        ccs10 = list(f10.minionsKilled + f10.jungleMinionsKilled)
-        ccs15 = list(f15.minionsKilled + f15.jungleMinionsKilled)
-        ccs20 = list(f20.minionsKilled + f20.jungleMinionsKilled)
-        return {'tt4kgold': l4k[0] if l4k else None, 'tt7kgold': l7k[0] if l7k else None,
-                'tt50cs': l50cs[0] if l50cs else None, 'tt100cs': l100cs[0] if l100cs else None,
-                'tt50jcs': l50jcs[0] if l50jcs else None, 'tt100jcs': l100jcs[0] if l100jcs else None,
-                'tt50ccs': l50ccs[0] if l50ccs else None, 'tt100ccs': l100ccs[0] if l100ccs else None,
-                'ttlvl6': l6lvl[0] if l6lvl else None, 'ttlvl11': l11lvl[0] if l11lvl else None,
-                'gold_at_5': g5[0] if g5 else None, 'gold_at_10': g10[0] if g10 else None,
-                'gold_at_15': g15[0] if g15 else None, 'gold_at_20': g20[0] if g20 else None,
-                'ccs_at_5': ccs5[0] if ccs5 else None, 'ccs_at_10': ccs10[0] if ccs10 else None,
-                'ccs_at_15': ccs15[0] if ccs15 else None, 'ccs_at_20': ccs20[0] if ccs20 else None}
-
-    def get_wards_placed_killed(tl):
-        events = list(chain.from_iterable([f['events'] for f in tl['frames']]))
-        ward_cols = ['yellow_trinkets', 'control_wards', 'undefined', 'sight_wards', 'blue_trinkets']
-        placed_cols = [col + '_placed' for col in ward_cols]
-        killed_cols = [col + '_killed' for col in ward_cols]
-
-        placed_ward_events = [event for event in events if event['type'] == 'WARD_PLACED']
-        killed_ward_events = [event for event in events if event['type'] == 'WARD_KILL']
-
-        if placed_ward_events:
-            df_placed = pd.DataFrame(
-                [(event['creatorId'], event['wardType'], event['timestamp']) for event in placed_ward_events]).groupby(
-                [0, 1], as_index=False).count()
-            df_placed.rename(columns={0: 'participant_id', 1: 'ward_type', 2: 'count'}, inplace=True)
-            df_placed.set_index('participant_id', inplace=True)
-            yt_p, cw_p, un_p, sw_p, bt_p = df_placed.loc[df_placed['ward_type'] == 'YELLOW_TRINKET'], df_placed.loc[
-                df_placed['ward_type'] == 'CONTROL_WARD'], df_placed.loc[df_placed['ward_type'] == 'UNDEFINED'], \
-                df_placed.loc[df_placed['ward_type'] == 'SIGHT_WARD'], \
-                df_placed.loc[df_placed['ward_type'] == 'BLUE_TRINKET']
-            df1 = pd.concat([yt_p, cw_p, un_p, sw_p, bt_p], axis=1).drop('ward_type', axis=1)
-            df1.columns = placed_cols
-            df1.reset_index(inplace=True)
-            df1 = df1.loc[df1.participant_id != 0]
-            df1.participant_id = df1.participant_id - 1
-            df1.set_index('participant_id', inplace=True)
-
-        if killed_ward_events:
-            df_killed = pd.DataFrame(
-                [(event['killerId'], event['wardType'], event['timestamp']) for event in killed_ward_events]).groupby(
-                [0, 1], as_index=False).count()
-            df_killed.rename(columns={0: 'participant_id', 1: 'ward_type', 2: 'count'}, inplace=True)
-            df_killed.set_index('participant_id', inplace=True)
-            yt_k, cw_k, un_k, sw_k, bt_k = df_killed.loc[df_killed['ward_type'] == 'YELLOW_TRINKET'], df_killed.loc[
-                df_killed['ward_type'] == 'CONTROL_WARD'], df_killed.loc[df_killed['ward_type'] == 'UNDEFINED'],\
-                df_killed.loc[df_killed['ward_type'] == 'SIGHT_WARD'], \
-                df_killed.loc[df_killed['ward_type'] == 'BLUE_TRINKET']
-            df2 = pd.concat([yt_k, cw_k, un_k, sw_k, bt_k], axis=1).drop('ward_type', axis=1)
-            df2.columns = killed_cols
-            df2.reset_index(inplace=True)
-            df2 = df2.loc[df2.participant_id != 0]
-            df2.participant_id = df2.participant_id - 1
-            df2.set_index('participant_id', inplace=True)
-
-        if placed_ward_events and killed_ward_events:
-            return pd.concat([df1, df2], axis=1).fillna(0).astype(int)
-        elif placed_ward_events:
-            return df1
-        elif killed_ward_events:
-            return df2
-        else:
-            return pd.DataFrame()
-
-    stats = timeline_participant_stats_to_dataframe(timeline)
-    ps = [stats.loc[stats.participantId == p_id] for p_id in range(1, 11)]
-    df_result = pd.concat([pd.DataFrame(timeto_stats_from_participant(p), index=(i,)) for i, p in enumerate(ps)])
-    wards = get_wards_placed_killed(timeline)
-    return pd.concat([df_result, wards], axis=1)
+    # Nested objects (player) can't be exported as a single value.
+    return [{k: v for k, v in p_id.items() if not isinstance(v, dict)} for p_id in participant_ids]
+
+
+def game_timeline_to_record(timeline):
+    record = {'lane': timeline['lane'], 'role': timeline['role'], 'participantId': timeline['participantId']}
+    for key, cols in TIMELINE_DELTAS_COLS:
+        deltas = timeline.get(key) or {}
+        for bucket, col in cols:
+            record[col] = deltas.get(bucket)
+    return record
+
+
+def game_teams_to_records(teams):
+    records = []
+    for team in teams:
+        bans = [i['championId'] for i in team['bans']]
+        while len(bans) < 5:
+            bans.append(0)
+        record = {k + '_team': v for k, v in team.items() if k != 'bans'}
+        for n, ban in enumerate(bans, start=1):
+            record['ban{}_team'.format(n)] = ban
+        records.append(record)
+    return [records[0]] * 5 + [records[1]] * 5
+
+
+def timeline_relevant_stats_to_records(timeline, thresholds=TIMELINE_THRESHOLDS, snapshots=TIMELINE_SNAPSHOTS):
+    metrics = [metric for _, metric, _ in thresholds] + [metric for _, metric, _ in snapshots]
+    metrics = list(dict.fromkeys(metrics + [m for metric in metrics for m in TIMELINE_DERIVED_METRICS.get(metric, [])]))
+    stats = timeline_frames_to_array(timeline, metrics)
+    n_frames = stats.shape[0]
+    records = [{} for _ in range(0, 10)]
+
+    if thresholds and n_frames:
+        values = stats[:, :, [metrics.index(metric) for _, metric, _ in thresholds]]
+        reached = values >= np.array([value for _, _, value in thresholds])
+        # First frame where the threshold is reached, frames x participants x thresholds -> participants x thresholds.
+        first_frame = reached.argmax(axis=0)
+        any_reached = reached.any(axis=0)
+        for p, record in enumerate(records):
+            for t, (col, _, _) in enumerate(thresholds):
+                record[col] = int(first_frame[p, t]) if any_reached[p, t] else None
+    else:
+        for record in records:
+            record.update({col: None for col, _, _ in thresholds})
+
+    if snapshots and n_frames:
+        frames = np.array([frame for _, _, frame in snapshots])
+        in_game = frames < n_frames
+        # snapshots x participants
+        values = stats[np.where(in_game, frames, 0), :, [metrics.index(metric) for _, metric, _ in snapshots]]
+        for p, record in enumerate(records):
+            for i, (col, _, _) in enumerate(snapshots):
+                record[col] = int(values[i, p]) if in_game[i] and not np.isnan(values[i, p]) else None
+    else:
+        for record in records:
+            record.update({col: None for col, _, _ in snapshots})
+
+    for record, events in zip(records, timeline_events_to_records(timeline)):
+        record.update(events)
+    return records
+
+
+def timeline_frames_to_array(timeline, metrics):
+    # frames x participants x metrics, missing values are NaN.
+    frame_metrics = [(i, metric) for i, metric in enumerate(metrics) if metric not in TIMELINE_DERIVED_METRICS]
+    frame_metrics_idx = [i for i, _ in frame_metrics]
+    stats = np.full((len(timeline['frames']), 10, len(metrics)), np.nan)
+    for f, frame in enumerate(timeline['frames']):
+        for p_frame in frame['participantFrames'].values():
+            stats[f, p_frame['participantId'] - 1, frame_metrics_idx] = \
+                [p_frame.get(metric, np.nan) for _, metric in frame_metrics]
+    for i, metric in enumerate(metrics):
+        if metric in TIMELINE_DERIVED_METRICS:
+            stats[:, :, i] = sum(stats[:, :, metrics.index(m)] for m in TIMELINE_DERIVED_METRICS[metric])
+    return stats
+
+
+def timeline_events_to_records(timeline, counters=TIMELINE_EVENT_COUNTERS):
+    handlers = {}
+    for i, (_, event_type, participant_field, subtype_field, subtype) in enumerate(counters):
+        handlers.setdefault(event_type, []).append((i, participant_field, subtype_field, subtype))
+
+    # Participant 0 collects the events without a champion behind them (minions, towers...).
+    counts = [[0] * len(counters) for _ in range(0, 11)]
+    for frame in timeline['frames']:
+        for event in frame['events']:
+            for i, participant_field, subtype_field, subtype in handlers.get(event['type'], ()):
+                if subtype_field is None or event.get(subtype_field) == subtype:
+                    participant_id = event.get(participant_field, 0)
+                    if 0 < participant_id <= 10:
+                        counts[participant_id][i] += 1
+
+    return [{col: count for (col, _, _, _, _), count in zip(counters, counts[p_id])} for p_id in range(1, 11)]
 
 
 def runes_reforged_to_dataframe(data=None):
@@ -0,0 +1,53 @@
+from config.constants import TIMELINE_DELTAS_COLS
+
+# Same fields and order as game_participant_ids_to_records when the game is not custom
+PLAYER_FIELDS = ['summonerName', 'accountId', 'currentAccountId', 'summonerId']
+
+
+def soloq_participants_pipeline(query):
+    # Builds the rows of game_to_records (no timeline stats, no custom metadata) inside MongoDB, one document per
+    # participant with the same fields as the record made in pandas.
+    return [
+        {'$match': query},
+        {'$project': {'_id': 0, 'info': '$$ROOT', 'p': '$participants', 'p_ids': '$participantIdentities',
+                      'teams': 1}},
+        {'$project': {'info._id': 0, 'info.participants': 0, 'info.participantIdentities': 0, 'info.teams': 0}},
+        # Participants and identities are paired by position
+        {'$unwind': {'path': '$p', 'includeArrayIndex': 'index'}},
+        {'$project': {'info': 1, 'p': 1,
+                      'p_id': {'$arrayElemAt': ['$p_ids', '$index']},
+                      'team': {'$arrayElemAt': ['$teams', {'$cond': [{'$lt': ['$index', 5]}, 0, 1]}]}}},
+        {'$project': {'info': 1, 'p': 1, 'stats': '$p.stats',
+                      'timeline': participant_timeline_expression('$p.timeline'),
+                      'p_id': participant_id_expression('$p_id'), 'team': team_expression('$team')}},
+        {'$project': {'p.stats': 0, 'p.timeline': 0, 'p.masteries': 0, 'p.runes': 0}},
+        # Fields repeated between blocks keep the first value, like add_missing_fields. The blocks are merged in order
+        # to set the position of every field, then again backwards so the first block with a field sets its value.
+        {'$replaceRoot': {'newRoot': {'$mergeObjects': ['$info', '$p_id', '$p', '$stats', '$timeline', '$team',
+                                                        '$timeline', '$stats', '$p', '$p_id', '$info']}}}
+    ]
+
+
+def participant_id_expression(p_id):
+    fields = {'participantId': p_id + '.participantId'}
+    for field in PLAYER_FIELDS:
+        fields[field] = '{}.player.{}'.format(p_id, field)
+    return fields
+
+
+def participant_timeline_expression(timeline):
+    fields = {'lane': timeline + '.lane', 'role': timeline + '.role', 'participantId': timeline + '.participantId'}
+    for key, cols in TIMELINE_DELTAS_COLS:
+        for bucket, col in cols:
+            # Missing deltas are exported as nulls, as in game_timeline_to_record
+            fields[col] = {'$ifNull': ['{}.{}.{}'.format(timeline, key, bucket), None]}
+    return fields
+
+
+def team_expression(team):
+    not_bans = {'$filter': {'input': {'$objectToArray': team}, 'cond': {'$ne': ['$$this.k', 'bans']}}}
+    suffixed = {'$arrayToObject': {'$map': {'input': not_bans,
+                                            'in': {'k': {'$concat': ['$$this.k', '_team']}, 'v': '$$this.v'}}}}
+    bans = {'ban{}_team'.format(n): {'$ifNull': [{'$arrayElemAt': [team + '.bans.championId', n - 1]}, 0]}
+            for n in range(1, 6)}
+    return {'$mergeObjects': [suffixed, bans]}
@@ -0,0 +1,39 @@
+import json
+
+# Fastest library installed first. Every codec takes bytes (or str) and returns bytes, so files and responses are
+# never decoded into str before being parsed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+if orjson is not None:
+    JSON_LIBRARY = 'orjson'
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def loads(data):
+        return orjson.loads(data)
+
+    def dumps(data):
+        return orjson.dumps(data, option=_ORJSON_OPTIONS)
+elif ujson is not None:
+    JSON_LIBRARY = 'ujson'
+
+    def loads(data):
+        return ujson.loads(bytes(data) if isinstance(data, (bytearray, memoryview)) else data)
+
+    def dumps(data):
+        return ujson.dumps(data).encode()
+else:
+    JSON_LIBRARY = 'json'
+
+    def loads(data):
+        return json.loads(bytes(data) if isinstance(data, (bytearray, memoryview)) else data)
+
+    def dumps(data):
+        return json.dumps(data).encode()
@@ -1,30 +1,29 @@
-def export_dataset_kwargs(df, kwargs):
+def export_record_kwargs(record, index, kwargs):
     if 'custom_names' in kwargs:
-        df['player_name'] = kwargs['custom_names']
+        record['player_name'] = kwargs['custom_names'][index]
 
     if 'team_names' in kwargs:
-        df.loc[:4, 'team_name'] = kwargs['team_names'][0]
-        df.loc[5:10, 'team_name'] = kwargs['team_names'][1]
+        record['team_name'] = kwargs['team_names'][0] if index < 5 else kwargs['team_names'][1]
 
     if 'custom_positions' in kwargs:
-        df['position'] = kwargs['custom_positions']
+        record['position'] = kwargs['custom_positions'][index]
 
     if 'week' in kwargs:
-        df['week'] = kwargs['week']
+        record['week'] = kwargs['week']
 
     if 'enemy' in kwargs:
-        df['enemy'] = kwargs['enemy']
+        record['enemy'] = kwargs['enemy']
 
     if 'game_n' in kwargs:
-        df['game_n'] = kwargs['game_n']
+        record['game_n'] = kwargs['game_n']
 
     if 'blue_win' in kwargs:
-        df['blue_win'] = kwargs['blue_win']
+        record['blue_win'] = kwargs['blue_win']
 
     if 'split' in kwargs:
-        df['split'] = kwargs['split']
+        record['split'] = kwargs['split']
 
     if 'season' in kwargs:
-        df['season'] = kwargs['season']
+        record['season'] = kwargs['season']
 
-    return df
+    return record
@@ -0,0 +1,61 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from converters.data2files import decompress_json
+from converters.data2frames import ColumnBuilder, builder_to_dataframe, game_to_records
+from converters.json_codec import loads
+from config.constants import TRANSFORM_CHUNK_SIZE
+
+
+def _decode_bson(data):
+    # bson comes with pymongo, the file system connector does not need it
+    import bson
+    return bson.decode(data)
+
+
+# Games travel to the workers as the bytes they are stored as, parsing them there costs less than pickling the parsed
+# dicts. Every game is (decoder, match, timeline, metadata).
+DECODERS = {'json': loads, 'zjson': decompress_json, 'bson': _decode_bson}
+
+
+def _transform_chunk(games, tl):
+    # Rows come back as the lists of a ColumnBuilder instead of a DataFrame per game
+    builder = ColumnBuilder()
+    for decoder, match, timeline, metadata in games:
+        decode = DECODERS[decoder]
+        for record in game_to_records(decode(match), decode(timeline) if timeline is not None else None, tl=tl,
+                                      **metadata):
+            builder.append(record)
+    return builder.columns, builder.n_rows
+
+
+class GameTransformer:
+    # Same rows as games_to_dataframe, with games_per_task games transformed by every task of a process pool. Chunks
+    # are merged in the order their games were read whatever the order they finish in.
+    def __init__(self, workers, games_per_task=TRANSFORM_CHUNK_SIZE):
+        self.workers = workers
+        self.games_per_task = games_per_task
+        self.executor = None
+
+    def transform(self, games, tl=False):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        builder = ColumnBuilder()
+        games = iter(games)
+        pending = deque()
+        while True:
+            # Only a few tasks per worker are queued, games are not read much faster than they are transformed
+            while len(pending) < self.workers * 2:
+                task = list(islice(games, self.games_per_task))
+                if not task:
+                    break
+                pending.append(self.executor.submit(_transform_chunk, task, tl))
+            if not pending:
+                break
+            builder.extend(*pending.popleft().result())
+        return builder_to_dataframe(builder)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
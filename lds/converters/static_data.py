@@ -0,0 +1,92 @@
+import pandas as pd
+from converters.data2files import read_json
+from converters.data2frames import champs_to_dataframe, items_to_dataframe, summs_to_dataframe, \
+    runes_reforged_to_dataframe
+from config.constants import STATIC_DATA_DIR
+
+
+class StaticData:
+    def __init__(self, database=None):
+        self.database = database
+        self.__tables = {}
+        self.__lookups = {}
+
+    @property
+    def champs(self):
+        return self.__get_table('champion')
+
+    @property
+    def items(self):
+        return self.__get_table('item')
+
+    @property
+    def summs(self):
+        return self.__get_table('summoner')
+
+    @property
+    def runes(self):
+        return self.__get_table('runes')
+
+    @property
+    def champ_names(self):
+        return self.__get_lookup('champion', 'key')
+
+    @property
+    def item_names(self):
+        return self.__get_lookup('item', 'id')
+
+    @property
+    def summ_names(self):
+        return self.__get_lookup('summoner', 'key')
+
+    @property
+    def rune_names(self):
+        return self.__get_lookup('runes', 'id')
+
+    def __get_lookup(self, data_type, key_col):
+        if data_type not in self.__lookups:
+            table = self.__get_table(data_type)
+            lookup = pd.Series(table['name'].values, index=table[key_col].astype(int).values)
+            self.__lookups[data_type] = lookup[~lookup.index.duplicated(keep='first')]
+        return self.__lookups[data_type]
+
+    def __get_table(self, data_type):
+        if data_type not in self.__tables:
+            self.__tables[data_type] = self.__load_table(data_type)
+        return self.__tables[data_type]
+
+    def __load_table(self, data_type):
+        if self.database is None:
+            if data_type == 'champion':
+                return champs_to_dataframe(read_json(save_dir=STATIC_DATA_DIR, file_name='champions'))
+            elif data_type == 'item':
+                return items_to_dataframe(read_json(save_dir=STATIC_DATA_DIR, file_name='items'))
+            elif data_type == 'summoner':
+                return summs_to_dataframe(read_json(save_dir=STATIC_DATA_DIR, file_name='summoners'))
+            elif data_type == 'runes':
+                return runes_reforged_to_dataframe()
+        else:
+            doc = self.database.find_one({'type': data_type}, {'_id': 0})
+            if data_type == 'champion':
+                return champs_to_dataframe(doc)
+            elif data_type == 'item':
+                return items_to_dataframe(doc)
+            elif data_type == 'summoner':
+                return summs_to_dataframe(doc)
+            elif data_type == 'runes':
+                return runes_reforged_to_dataframe(data=doc['runes'])
+        raise ValueError('Static data type {} not supported.'.format(data_type))
+
+
+_registry = {}
+
+
+def get_static_data(database=None):
+    key = STATIC_DATA_DIR if database is None else database.full_name
+    if key not in _registry:
+        _registry[key] = StaticData(database)
+    return _registry[key]
+
+
+def invalidate_static_data():
+    _registry.clear()
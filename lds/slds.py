@@ -1,6 +1,6 @@
 import argparse
-from connectors import filesystem, database
-from config.constants import SUPPORTED_LEAGUES, SUPPORTED_CONNECTORS, REGIONS, PATCH_PATTERN, API_KEY, AVAILABLE_OUTPUTS
+from config.constants import SUPPORTED_LEAGUES, SUPPORTED_CONNECTORS, REGIONS, PATCH_PATTERN, API_KEY, \
+    AVAILABLE_OUTPUTS, EXPORT_CHUNK_SIZE, ROSTER_COLS
 
 
 def parse_args():
@@ -23,6 +23,12 @@ def parse_args():
     shared.add_argument('-usd', '--update_static_data', help='Update static data information.', action='store_true')
     shared.add_argument('-ng', '--n_games', help='Set the number of games to download from Solo Q.', type=int)
     shared.add_argument('-bi', '--begin_index', help='Set the begin index of the Solo Q downloads.', type=int)
+    shared.add_argument('-st', '--stream', help='Transform and write the export in chunks of games instead of all at '
+                                                'once. Every output can be streamed.', action='store_true')
+    shared.add_argument('-cs', '--chunk_size', help='Set the number of games of every chunk of streamed exports.',
+                        type=int, default=EXPORT_CHUNK_SIZE)
+    shared.add_argument('-w', '--workers', help='Set the number of processes transforming the games of the export.',
+                        type=int, default=1)
     shared.add_argument('-ms', '--merge_soloq', help='Merge SoloQ data with info of players.', action='store_true')
 
     # FS commands
@@ -30,6 +36,9 @@ def parse_args():
     filesystem.add_argument('-csv', help='Export data as CSV.', action='store_true')
     filesystem.add_argument('-fu', '--force_update', help='Force the update of the exports datasets.',
                                    action='store_true')
+    filesystem.add_argument('-cp', '--convert_packfiles', help='Move the games of the league from JSON files to '
+                                                               'compressed packfiles, new downloads are packed too.',
+                            action='store_true')
 
     # DB commands
     databases.add_argument('-ta', '--team_abbv', help='Work with the data of one or more teams selected through '
@@ -47,10 +56,25 @@ def parse_args():
                            .format(AVAILABLE_OUTPUTS))
     databases.add_argument('-pd', '--pro_data', help='Just export the data of the pro players registered in the DB.',
                            action='store_true')
+    databases.add_argument('-rb', '--rebuild', help='Replace the whole DB output instead of upserting the rows that '
+                                                    'changed.', action='store_true')
     databases.add_argument('-fn', '--file_name', help='Choose the name of the exported file.')
     databases.add_argument('-tl', '--timeline', action='store_true', help='Add timeline data such as time to get level '
                                                                           '6, 11; wards killed and placed per type; '
                                                                           'etc...')
+    databases.add_argument('-ei', '--ensure_indexes', help='Create the indexes used by downloads and exports and add '
+                                                           'the patch field to the games stored without it.',
+                           action='store_true')
+    databases.add_argument('-ngi', '--normalize_game_ids', help='Store the gameId of every game as an int, needed by '
+                                                                'exports of games downloaded before it was.',
+                           action='store_true')
+    databases.add_argument('-pu', '--pushdown', help='Build the Solo Q export rows inside MongoDB and download only '
+                                                     'them instead of the whole games. Not available with -tl.',
+                           action='store_true')
+    databases.add_argument('-rp', '--register_players', help='Register the players of a roster CSV file with the '
+                                                             'columns {}.'.format(ROSTER_COLS))
+    databases.add_argument('-ex', '--explain', help='Print the query plan of the queries used to find games.',
+                           action='store_true')
 
     return parser.parse_args()
 
@@ -94,9 +118,12 @@ def main():
               'script call with region and league parameters set: {}. Something like that: \"python program.py '
               '-r EUW -l SOLOQ -c {}\"'.format(SUPPORTED_CONNECTORS, SUPPORTED_CONNECTORS[0]))
         return
+    # Connectors are only imported once the arguments are checked, each one loads its own dependencies
     elif args.connector.upper() == 'FS':
+        from connectors import filesystem
         filesystem.parse_args(args)
     elif args.connector.upper() == 'DB':
+        from connectors import database
         database.parse_args(args, API_KEY)
     else:
         print('That connector is not supported.')
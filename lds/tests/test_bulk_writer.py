@@ -0,0 +1,86 @@
+import time
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from pymongo.errors import AutoReconnect  # noqa: E402
+from connectors.bulk_writer import BulkWriter  # noqa: E402
+
+
+class FailingDatabase:
+    # Every insert_many fails as if the server could not be reached
+    def get_collection(self, collection_name):
+        return self
+
+    def insert_many(self, documents, ordered=True):
+        raise AutoReconnect('connection lost')
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_flushes_once_batch_size_documents_are_buffered():
+    database = mongomock.MongoClient().slds
+    writer = BulkWriter(database, batch_size=3, flush_interval=60)
+    writer.insert('soloq_m', {'gameId': 1})
+    writer.insert('soloq_tl', {'gameId': 1})
+    assert database.soloq_m.count_documents({}) == 0
+    writer.insert('soloq_m', {'gameId': 2})
+    assert database.soloq_m.count_documents({}) == 2
+    assert database.soloq_tl.count_documents({}) == 1
+    assert writer.n_inserted == 3
+    assert writer.n_buffered == 0
+    assert writer.timer is None
+
+
+def test_flushes_once_flush_interval_has_passed():
+    database = mongomock.MongoClient().slds
+    writer = BulkWriter(database, batch_size=100, flush_interval=0.05)
+    writer.insert('soloq_m', {'gameId': 1})
+    assert wait_for(lambda: writer.n_inserted == 1)
+    assert database.soloq_m.count_documents({}) == 1
+    assert writer.timer is None
+    writer.close()
+
+
+def test_skips_documents_already_stored():
+    database = mongomock.MongoClient().slds
+    database.soloq_m.create_index('gameId', unique=True)
+    database.soloq_m.insert_one({'gameId': 1})
+    with BulkWriter(database, batch_size=100, flush_interval=60) as writer:
+        writer.insert('soloq_m', {'gameId': 1})
+        writer.insert('soloq_m', {'gameId': 2})
+    assert writer.n_inserted == 1
+    assert writer.n_duplicated == 1
+    assert sorted(doc['gameId'] for doc in database.soloq_m.find()) == [1, 2]
+
+
+def test_flushes_on_close():
+    database = mongomock.MongoClient().slds
+    writer = BulkWriter(database, batch_size=100, flush_interval=60)
+    writer.insert('soloq_m', {'gameId': 1})
+    writer.close()
+    assert database.soloq_m.count_documents({}) == 1
+    assert writer.timer is None
+
+
+def test_raises_errors_of_the_timer_flush_on_next_insert():
+    writer = BulkWriter(FailingDatabase(), batch_size=100, flush_interval=0.01)
+    writer.insert('soloq_m', {'gameId': 1})
+    assert wait_for(lambda: writer.timer_error is not None)
+    with pytest.raises(AutoReconnect):
+        writer.insert('soloq_m', {'gameId': 2})
+
+
+def test_raises_errors_of_the_timer_flush_on_close():
+    writer = BulkWriter(FailingDatabase(), batch_size=100, flush_interval=0.01)
+    writer.insert('soloq_m', {'gameId': 1})
+    assert wait_for(lambda: writer.timer_error is not None)
+    with pytest.raises(AutoReconnect):
+        writer.close()
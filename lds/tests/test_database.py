@@ -0,0 +1,49 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from connectors.database import DataBase  # noqa: E402
+
+
+def make_database():
+    # Only the Mongo connection is used by the tested methods
+    db = DataBase.__new__(DataBase)
+    db.mongo_cnx = mongomock.MongoClient()
+    return db
+
+
+def test_normalize_game_ids_drops_string_copies_without_index():
+    db = make_database()
+    coll = db.mongo_cnx.slds.soloq_tl
+    coll.insert_many([
+        {'gameId': 1, 'platformId': 'EUW1', 'frames': []},
+        {'gameId': '1', 'platformId': 'EUW1', 'frames': []},
+        {'gameId': '2', 'platformId': 'EUW1', 'frames': []},
+        {'gameId': '2', 'platformId': 'EUW1', 'frames': []},
+        {'gameId': '2', 'platformId': 'NA1', 'frames': []},
+    ])
+
+    db.normalize_game_ids()
+
+    games = sorted((doc['gameId'], doc['platformId']) for doc in coll.find())
+    assert games == [(1, 'EUW1'), (2, 'EUW1'), (2, 'NA1')]
+    # The unique index of ensure_indexes can be built afterwards
+    coll.create_index([('gameId', 1), ('platformId', 1)], unique=True)
+
+
+def test_patch_filter_adds_the_patch_of_games_stored_without_it():
+    db = make_database()
+    db.league = 'SOLOQ'
+    db.explain = False
+    coll = db.mongo_cnx.slds.soloq_m
+    coll.insert_many([
+        {'gameId': 1, 'platformId': 'EUW1', 'gameVersion': '9.3.263.9211', 'patch': '9.3'},
+        {'gameId': 2, 'platformId': 'EUW1', 'gameVersion': '9.3.264.1234'},
+        {'gameId': 3, 'platformId': 'EUW1', 'gameVersion': '9.4.265.1234'},
+    ])
+
+    game_ids = db.get_stored_game_ids(patch='9.3', team_abbv=None, competition=None, begin_time=None,
+                                      end_time=None)
+
+    assert sorted(game_ids) == [(1, 'EUW1'), (2, 'EUW1')]
+    assert coll.count_documents({'patch': {'$exists': False}}) == 0
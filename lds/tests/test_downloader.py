@@ -0,0 +1,171 @@
+import pytest
+from requests import Response
+from requests.exceptions import HTTPError
+from connectors import downloader
+from connectors.downloader import Downloader, RateLimiter, parse_rate_limits, hold_watermarks
+from config.constants import RATE_LIMIT_MARGIN
+
+
+class FakeClock:
+    # Stands for the time module of the downloader, sleeping only moves the clock forward
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class StubSession:
+    # Answers every get with the next response of the list and records when it was sent
+    def __init__(self, clock, responses):
+        self.clock = clock
+        self.responses = list(responses)
+        self.sent_at = []
+
+    def get(self, url, params=None, timeout=None):
+        self.sent_at.append(self.clock.now)
+        return self.responses.pop(0)
+
+
+def response(status_code, content=b'{}', **headers):
+    r = Response()
+    r.status_code = status_code
+    r._content = content
+    r.headers.update({name.replace('_', '-'): value for name, value in headers.items()})
+    return r
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(downloader, 'time', clock)
+    return clock
+
+
+def make_downloader(clock, responses, max_retries=3):
+    d = Downloader('api-key', workers=1, max_retries=max_retries)
+    d.session = StubSession(clock, responses)
+    return d
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits('20:1,100:120') == [(20, 1), (100, 120)]
+    assert parse_rate_limits('') == []
+
+
+def test_rate_limiter_waits_for_the_window_to_pass(clock):
+    limiter = RateLimiter([(2, 1)])
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.now == 0
+    limiter.acquire()
+    assert clock.now == pytest.approx(1 + RATE_LIMIT_MARGIN)
+
+
+def test_rate_limiter_counts_requests_of_other_clients(clock):
+    limiter = RateLimiter([(2, 1)])
+    limiter.sync([(2, 1)])
+    limiter.acquire()
+    assert clock.now == pytest.approx(1 + RATE_LIMIT_MARGIN)
+
+
+def test_get_sets_limits_from_headers(clock):
+    d = make_downloader(clock, [response(200, X_App_Rate_Limit='5:1', X_App_Rate_Limit_Count='5:1',
+                                         X_Method_Rate_Limit='50:10', X_Method_Rate_Limit_Count='1:10')])
+    d.get('EUW1', 'match', '/match')
+    app_limiter, method_limiter = d.app_limiters['EUW1'], d.method_limiters[('EUW1', 'match')]
+    assert {seconds: (count, len(spent)) for seconds, (count, spent) in app_limiter.buckets.items()} == {1: (5, 5)}
+    assert {seconds: (count, len(spent)) for seconds, (count, spent) in method_limiter.buckets.items()} == \
+        {10: (50, 1)}
+
+
+def test_get_waits_retry_after_on_429(clock):
+    d = make_downloader(clock, [response(429, Retry_After='3', X_Rate_Limit_Type='application'),
+                                response(200, b'{"gameId": 1}')])
+    assert d.get('EUW1', 'match', '/match') == {'gameId': 1}
+    assert d.session.sent_at == [0, 3]
+
+
+def test_get_pauses_only_the_method_on_method_429(clock):
+    d = make_downloader(clock, [response(429, Retry_After='2', X_Rate_Limit_Type='method'),
+                                response(200)])
+    d.get('EUW1', 'match', '/match')
+    assert d.session.sent_at == [0, 2]
+    assert d.app_limiters['EUW1'].paused_until == 0
+    assert d.method_limiters[('EUW1', 'match')].paused_until == 2
+
+
+def test_get_raises_once_retries_are_exhausted(clock):
+    d = make_downloader(clock, [response(500) for _ in range(3)], max_retries=2)
+    with pytest.raises(HTTPError):
+        d.get('EUW1', 'match', '/match')
+    assert len(d.session.sent_at) == 3
+    assert not d.session.responses
+
+
+def test_get_raises_429_once_retries_are_exhausted(clock):
+    d = make_downloader(clock, [response(429, Retry_After='1') for _ in range(2)], max_retries=1)
+    with pytest.raises(HTTPError) as e:
+        d.get('EUW1', 'match', '/match')
+    assert e.value.response.status_code == 429
+    assert d.session.sent_at == [0, 1]
+
+
+def test_get_does_not_retry_client_errors(clock):
+    d = make_downloader(clock, [response(404), response(200)])
+    with pytest.raises(HTTPError):
+        d.get('EUW1', 'match', '/match')
+    assert len(d.session.sent_at) == 1
+
+
+def crawl(pages, watermarks, monkeypatch):
+    # pages: (account id, begin index) -> matches of the page, or the status code of an error
+    monkeypatch.setattr(downloader, 'MATCHLIST_PAGE_SIZE', 2)
+    d = Downloader('api-key', workers=2)
+
+    def get_matchlist_page(account_id, platform, begin_index, end_index, **params):
+        page = pages[(account_id, begin_index)]
+        if isinstance(page, int):
+            raise HTTPError(response=response(page))
+        return [{'gameId': gid, 'platformId': 'EUW1', 'timestamp': ts} for gid, ts in page]
+
+    d.get_matchlist_page = get_matchlist_page
+    return sorted(m['gameId'] for m in d.crawl_matchlists(list(watermarks), 'EUW1', watermarks=watermarks))
+
+
+def test_crawl_moves_watermarks_to_the_newest_game(monkeypatch):
+    watermarks = {'a': 10, 'b': 10}
+    pages = {('a', 0): [(4, 40), (3, 30)], ('a', 2): [(2, 20)], ('b', 0): []}
+    assert crawl(pages, watermarks, monkeypatch) == [2, 3, 4]
+    assert watermarks == {'a': 40, 'b': 10}
+
+
+def test_crawl_keeps_the_watermark_of_accounts_with_a_failed_page(monkeypatch):
+    watermarks = {'a': 10, 'b': 10}
+    pages = {('a', 0): [(4, 40), (3, 30)], ('a', 2): 503, ('b', 0): [(5, 50)]}
+    assert crawl(pages, watermarks, monkeypatch) == [3, 4, 5]
+    assert watermarks == {'a': 10, 'b': 50}
+
+
+def test_download_returns_the_items_whose_fetch_failed():
+    d = Downloader('api-key', workers=2)
+
+    def fetch(item):
+        if item % 3 == 0:
+            raise HTTPError(response=response(500))
+        return item
+
+    saved = []
+    n_items, failed = d.download(iter(range(10)), fetch, saved.append)
+    assert n_items == 10
+    assert sorted(failed) == [0, 3, 6, 9]
+    assert sorted(saved) == [1, 2, 4, 5, 7, 8]
+
+
+def test_hold_watermarks_below_the_oldest_game_not_downloaded():
+    watermarks = {'a': 50, 'b': 20}
+    hold_watermarks(watermarks, [40, 30])
+    assert watermarks == {'a': 29, 'b': 20}